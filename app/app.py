@@ -1,146 +1,66 @@
+import os
+import sys
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-
-# Function to load and preprocess data
-@st.cache_data
-def load_data(file_path):
-    # Read the Excel file
-    df = pd.read_excel(file_path)
-
-    # Rename columns for easier understanding
-    df = df.rename(columns={
-        'MeasureValueNumber': 'Number of Cases',
-        'ReportingCategory2': 'Injury Type'
-    })
-    
-    # Filter and clean the H1 data
-    h1 = df[df['TableReference'] == 'H1']
-    h1 = h1.rename(columns={'ReportingCategory4': 'Age Group'})
-    h1 = h1[h1['Age Group'] != 'All ages']
-    h1 = h1[h1['Injury Type'] != 'All external causes']
-
-    # Filter and clean the D2 data
-    d2 = df[df['TableReference'] == 'D2']
-    d2 = d2[d2['Injury Type'] != 'All external causes']
-    
-    return h1, d2
-
-# Cache data processing for bar chart with ordered age groups
-@st.cache_data
-def process_data_for_bar_chart(h1):
-    # Define the desired order of age groups
-    age_order = ['0-4', '5-9', '10-14', '15-19', '20-24', '25-29', '30-34', '45-49', '50-54', 
-                 '55-59', '60-64', '65-69', '70-74', '75-79', '80-84', '85-89', '90-94', '95+']
-    
-    # Set 'Age Group' as a categorical type with the specified order
-    h1['Age Group'] = pd.Categorical(h1['Age Group'], categories=age_order, ordered=True)
-    
-    # Group by 'Injury Type' and 'Age Group', then sum the 'Number of Cases'
-    grouped_by_type = h1.groupby(['Injury Type', 'Age Group'], as_index=False)['Number of Cases'].sum()
-    
-    # Sort by 'Age Group' to ensure the order is maintained in the plot
-    grouped_by_type = grouped_by_type.sort_values('Age Group')
-    
-    return grouped_by_type
-
-# Path to the Excel file (update with your file path)
-file_path = 'data/AIHW_INJCAT213_Machine_readable_21062024.xlsx'
-
-# Streamlit sidebar UI components
-st.sidebar.title("Navigation")
-
-# Tab selection in the sidebar
-tab = st.sidebar.radio("Select a Tab", [
-    "Intro", 
-    "Total Injuries by Type (Bar Chart)", 
-    "Total Injuries by Type (Pie Chart)", 
-    "Interactive Stacked Bar Chart by Age Group",
-    "Percentage of Injury Cases by Age Group",
-    "Annual Injury Cases by Year",
-    "Insights",
-    "References",
-    "Contact"
-])
-
-# Display the title and description
-st.title("Injury Data Visualizer")
-
-# Load the data
-h1, d2 = load_data(file_path)
-
-# Display content based on selected tab
-if tab == "Intro":
-    st.subheader("Introduction")
-    st.markdown("""
-        Welcome to the **Injury Data Visualizer**! This app helps you explore and understand injury data 
-        provided by the AIHW (Australian Institute of Health and Welfare). It provides insights into 
-        different types of injuries and trends across various age groups. You can use this tool to:
-        
-        1. **Explore the total number of injuries** by type through bar and pie charts.
-        2. **Visualize injury cases by age group and type** using interactive stacked bar charts.
-        3. **Understand trends** like which injury types are more prevalent in certain age groups.
-        4. **Explore injury cases annually** through visualizations that break down the data by year.
-
-        ### Features:
-        - **Interactive Charts**: Explore data visually with interactive charts powered by Plotly.
-        - **Insights**: Learn about the most common injuries and how they vary with age.
-        
-        Please use the navigation options on the sidebar to explore the different visualizations and insights.
-    """)
-
-elif tab == "Total Injuries by Type (Bar Chart)":
-    st.subheader("Total Number of Injuries by Type (Bar Chart)")
-    
-    # Use the cached data processing function
-    grouped_by_type = process_data_for_bar_chart(h1)
-    
-    # Create the chart with the preprocessed (cached) data
-    fig_bar = px.bar(
+
+# Make the shared `fall` package importable when run with `streamlit run app/app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fall import plotting
+from fall.admin import admin_panel
+from fall.age_bands import band_labels
+from fall.crossfilter import HEIGHT as CROSSFILTER_HEIGHT, crossfilter_page
+from fall.cube import AGE_GRANULARITY
+from fall.figure_cache import FigureCache
+from fall.figures import install_package_bundle
+from fall.instrumentation import recorder, stage
+from fall.loader import boot, cube_task, population_task
+from fall.presentation import wait_for
+from fall.projection import RATE_GRANULARITY, SEXES
+from fall.rates import rates
+from fall.registry import describe
+
+# Background loader shared by all sessions: starts splitting and aggregating
+# every release when the process boots (python -m fall.loader app/app.py) or,
+# under plain `streamlit run`, on the first visit, and serves readiness on
+# $FALL_READY_PORT. The workbook index it holds is built from metadata only.
+@st.cache_resource
+def get_loader():
+    return boot(('injury',))
+
+# Height of the frame each chart is drawn in (Plotly's default figure height plus margin)
+FIGURE_HEIGHT = 470
+
+# Charts are built from the aggregate cube through fall.plotting, which
+# reduces every slice to the plotted grain before Plotly sees it
+def injuries_by_type_bar(cube):
+    # Totals by injury type, precomputed in the cube
+    grouped_by_type = cube.slice('H1', ['Injury Type'])
+    return plotting.bar(
         grouped_by_type,
         x='Injury Type',
         y='Number of Cases',
         title="Total Number of Injuries by Type"
     )
 
-    st.plotly_chart(fig_bar)
-    
-elif tab == "Total Injuries by Type (Pie Chart)":
-    # Display subheader
-    st.subheader("Total Number of Injuries by Type (Pie Chart)")
-
-    # Process the data (ensure the function returns a DataFrame with columns 'Injury Type' and 'Number of Cases')
-    grouped_by_type = process_data_for_bar_chart(h1)  # Ensure this function is defined correctly
-
-    # Check the structure of the grouped_by_type DataFrame to verify it has the expected columns
-    if not {'Injury Type', 'Number of Cases'}.issubset(grouped_by_type.columns):
-        st.error("DataFrame must contain 'Injury Type' and 'Number of Cases' columns")
-    else:
-        # Calculate the total number of cases
-        total_cases = grouped_by_type['Number of Cases'].sum()
-
-        # Add a new column for percentage values
-        grouped_by_type['Percentage'] = ((grouped_by_type['Number of Cases'] / total_cases) * 100).round(2)
-
-        # Create the pie chart
-        fig_pie = px.pie(
-            grouped_by_type,
-            names='Injury Type',  # Column for injury types
-            values='Percentage',  # Use the calculated percentage
-            title="Total Number of Injuries by Type"
-        )
-        
-        # Update the traces to display both label and percentage
-        fig_pie.update_traces(textinfo='label+percent', textposition='inside')
-        
-        # Display the pie chart
-        st.plotly_chart(fig_pie)
-    
-    
-elif tab == "Interactive Stacked Bar Chart by Age Group":
-    st.subheader("Interactive Stacked Bar Chart of Injury Cases by Age Group and Type")
-    fig_stack = px.bar(
-        h1,
+def injuries_by_type_pie(cube):
+    # Totals by injury type, precomputed in the cube
+    grouped_by_type = cube.slice('H1', ['Injury Type'])
+    fig_pie = plotting.pie(
+        grouped_by_type,
+        names='Injury Type',  # Column for injury types
+        values='Number of Cases',  # Plotly shows each type's share of the total
+        title="Total Number of Injuries by Type"
+    )
+
+    # Update the traces to display both label and percentage
+    fig_pie.update_traces(textinfo='label+percent', textposition='inside')
+    return fig_pie
+
+def cases_by_age_stacked(cube):
+    grouped = cube.slice('H1', ['Age Group', 'Injury Type'])
+    fig_stack = plotting.bar(
+        grouped,
         x='Age Group',
         y='Number of Cases',
         color='Injury Type',
@@ -149,44 +69,32 @@ elif tab == "Interactive Stacked Bar Chart by Age Group":
 
     # Explicitly set the order of categories on the x-axis
     fig_stack.update_layout(
-        xaxis=dict(type='category', categoryorder='array', categoryarray=['0-4', '5-9', '10-14', '15-19', 
-                                                                    '20-24', '25-29', '30-34', '45-49', 
-                                                                    '50-54', '55-59', '60-64', '65-69', 
-                                                                    '70-74', '75-79', '80-84', '85-89', 
-                                                                    '90-94', '95+'])
+        barmode='stack',
+        xaxis=dict(type='category', categoryorder='array', categoryarray=list(band_labels(AGE_GRANULARITY)))
     )
+    return fig_stack
 
-    fig_stack.update_layout(barmode='stack', xaxis={'categoryorder': 'category ascending'})
-    st.plotly_chart(fig_stack)
-
-elif tab == "Percentage of Injury Cases by Age Group":
-    st.subheader("Percentage of Injury Cases by Age Group and Type (Stacked Bar Chart)")
-    grouped = h1.groupby(['Age Group', 'Injury Type'], as_index=False)['Number of Cases'].sum()
-    age_group_totals = grouped.groupby('Age Group')['Number of Cases'].transform('sum')
-    grouped['Percentage'] = (grouped['Number of Cases'] / age_group_totals) * 100
-    fig_percentage = px.bar(
+def cases_by_age_percentage(cube):
+    grouped = cube.slice('H1', ['Age Group', 'Injury Type'])
+    fig_percentage = plotting.bar(
         grouped,
         x='Age Group',
-        y='Percentage',
+        y='Number of Cases',
         color='Injury Type',
+        percent_of='Age Group',
+        labels={'Number of Cases': 'Percentage'},
         title="Percentage of Injury Cases by Age Group and Type"
     )
     # Explicitly set the order of categories on the x-axis
     fig_percentage.update_layout(
-        xaxis=dict(type='category', categoryorder='array', categoryarray=['0-4', '5-9', '10-14', '15-19', 
-                                                                    '20-24', '25-29', '30-34', '45-49', 
-                                                                    '50-54', '55-59', '60-64', '65-69', 
-                                                                    '70-74', '75-79', '80-84', '85-89', 
-                                                                    '90-94', '95+'])
+        barmode='stack',
+        xaxis=dict(type='category', categoryorder='array', categoryarray=list(band_labels(AGE_GRANULARITY)))
     )
-    fig_percentage.update_layout(barmode='stack', xaxis={'categoryorder': 'category ascending'})
-    st.plotly_chart(fig_percentage)
-
-elif tab == "Annual Injury Cases by Year":
-    st.subheader("Annual Number of Injury Cases by Type (Bar Chart for D2 data)")
-    d2_aggregated = d2.groupby(['ReportingCategory4', 'Injury Type'], as_index=False).agg({'Number of Cases': 'sum'})
-    d2_aggregated = d2_aggregated.rename(columns={'ReportingCategory4': 'Year'})
-    fig_d2 = px.bar(
+    return fig_percentage
+
+def annual_cases(cube):
+    d2_aggregated = cube.slice('D2', ['Year', 'Injury Type'])
+    fig_d2 = plotting.bar(
         d2_aggregated,
         x='Year',
         y='Number of Cases',
@@ -194,47 +102,233 @@ elif tab == "Annual Injury Cases by Year":
         title="Annual Number of Injury Cases by Type (per 100,000 Population)"
     )
     fig_d2.update_layout(barmode='group')
-    st.plotly_chart(fig_d2)
+    return fig_d2
 
-elif tab == "Insights":
-    st.subheader("Injury Data Insights")
-    st.markdown("""
-        Based on the data visualized above, the following insights can be observed:
+# Crude and age-standardised rates side by side for each value of by
+def rates_chart(table, by):
+    long = table.melt(id_vars=[by], value_vars=['Crude Rate', 'Age-standardised Rate'], var_name='Rate', value_name='Per 100,000')
+    fig = plotting.bar(
+        long,
+        x=by,
+        y='Per 100,000',
+        color='Rate',
+        title=f"Injury Hospitalisations per 100,000 Population by {by}"
+    )
+    fig.update_layout(barmode='group')
+    return fig
+
+# Chart tabs: subheader, table the chart is drawn from and figure builder
+CHART_TABS = {
+    "Total Injuries by Type (Bar Chart)": ("Total Number of Injuries by Type (Bar Chart)", 'H1', injuries_by_type_bar),
+    "Total Injuries by Type (Pie Chart)": ("Total Number of Injuries by Type (Pie Chart)", 'H1', injuries_by_type_pie),
+    "Interactive Stacked Bar Chart by Age Group": (
+        "Interactive Stacked Bar Chart of Injury Cases by Age Group and Type", 'H1', cases_by_age_stacked
+    ),
+    "Percentage of Injury Cases by Age Group": (
+        "Percentage of Injury Cases by Age Group and Type (Stacked Bar Chart)", 'H1', cases_by_age_percentage
+    ),
+    "Annual Injury Cases by Year": (
+        "Annual Number of Injury Cases by Type (Bar Chart for D2 data)", 'D2', annual_cases
+    ),
+}
+
+# Serialized chart pages shared by all sessions; the plotly.js bundle they
+# load is served from app/static
+@st.cache_resource
+def get_figure_cache():
+    install_package_bundle()
+    cache = FigureCache()
+    recorder().watch_cache('figures', cache)
+    return cache
+
+# Cache key of a chart: tab, filters (none yet) and data version
+def figure_key(tab, version, filters=()):
+    return (tab, tuple(filters), version)
+
+# Every chart tab drawn from one table of a release, built in the background
+# once the table's cube has loaded, once per process
+@st.cache_resource
+def warm_figures(file_path, table_ref):
+    cube = get_loader().result(cube_task(file_path, table_ref))
+    get_figure_cache().warm({
+        figure_key(tab, cube.version): (lambda build=build: build(cube))
+        for tab, (_, ref, build) in CHART_TABS.items() if ref == table_ref
+    })
+
+# Stage timings of this rerun (opt in with FALL_INSTRUMENT=1)
+instruments = recorder()
+with instruments.rerun('app'):
+    loader = get_loader()
+    registry = loader.registry
+
+    # Streamlit sidebar UI components
+    st.sidebar.title("Navigation")
+
+    # Machine-readable release the charts are drawn from, newest first
+    releases = registry.releases('Machine_readable')
+    file_path = st.sidebar.selectbox(
+        "Data release", [workbook['path'] for workbook in releases],
+        format_func=lambda path: describe(next(w for w in releases if w['path'] == path))
+    )
+
+    # Tab selection in the sidebar
+    tab = st.sidebar.radio("Select a Tab", [
+        "Intro", 
+        "Total Injuries by Type (Bar Chart)", 
+        "Total Injuries by Type (Pie Chart)", 
+        "Interactive Stacked Bar Chart by Age Group",
+        "Percentage of Injury Cases by Age Group",
+        "Annual Injury Cases by Year",
+        "Injury Rates",
+        "Cross-filter Explorer",
+        "Data Tables",
+        "Insights",
+        "References",
+        "Contact"
+    ])
+
+    # Display the title and description
+    st.title("Injury Data Visualizer")
+
+    # Pre-warm the charts of every table of this release that has loaded
+    for table_ref in dict.fromkeys(ref for _, ref, _ in CHART_TABS.values()):
+        if loader.ready(cube_task(file_path, table_ref)):
+            warm_figures(file_path, table_ref)
+
+    # Display content based on selected tab
+    if tab == "Intro":
+        st.subheader("Introduction")
+        st.markdown("""
+            Welcome to the **Injury Data Visualizer**! This app helps you explore and understand injury data 
+            provided by the AIHW (Australian Institute of Health and Welfare). It provides insights into 
+            different types of injuries and trends across various age groups. You can use this tool to:
+        
+            1. **Explore the total number of injuries** by type through bar and pie charts.
+            2. **Visualize injury cases by age group and type** using interactive stacked bar charts.
+            3. **Understand trends** like which injury types are more prevalent in certain age groups.
+            4. **Explore injury cases annually** through visualizations that break down the data by year.
+
+            ### Features:
+            - **Interactive Charts**: Explore data visually with interactive charts powered by Plotly.
+            - **Insights**: Learn about the most common injuries and how they vary with age.
+        
+            Please use the navigation options on the sidebar to explore the different visualizations and insights.
+        """)
+
+    elif tab in CHART_TABS:
+        subheader, table_ref, build = CHART_TABS[tab]
+        st.subheader(subheader)
+
+        # Drawn as soon as this tab's own table has loaded; a progress bar until then
+        task = cube_task(file_path, table_ref)
+        if wait_for(loader, [task], f"Loading table {table_ref}..."):
+            with stage('load'):
+                cube = loader.result(task)
+
+            # Pre-built page from the figure cache: no pandas or Plotly work on a rerun
+            page = get_figure_cache().get(figure_key(tab, cube.version), lambda: build(cube))
+            instruments.add_payload(len(page))
+            st.iframe(page, height=FIGURE_HEIGHT)
+
+    elif tab == "Injury Rates":
+        st.subheader("Crude and Age-standardised Injury Rates")
+        st.markdown("""
+            Rates per 100,000 population, computed for the selection from the H1 hospitalisations and the
+            population implied by table H2. Age-standardised rates use the 2001 Australian standard population.
+        """)
+
+        tasks = [cube_task(file_path, 'H1'), population_task(file_path)]
+        if wait_for(loader, tasks, "Loading table H1 and population..."):
+            with stage('load'):
+                cube, population = (loader.result(task) for task in tasks)
+
+            col1, col2, col3 = st.columns(3)
+            by = col1.selectbox("Rates by", ['Injury Type', 'Sex', 'Age Group'])
+            sexes = col2.multiselect("Sex", SEXES, default=SEXES)
+            ages = list(band_labels(RATE_GRANULARITY))
+            youngest, oldest = col3.select_slider("Age groups", options=ages, value=(ages[0], ages[-1]))
+            filters = {'Sex': tuple(sexes), 'Age Group': tuple(ages[ages.index(youngest):ages.index(oldest) + 1])}
+
+            # Every stratum of the selection in one vectorized pass over the cube's finest slice
+            with stage('aggregate'):
+                table = rates(cube.slice('H1', ['Injury Type', 'Age Group', 'Sex']), population, by=[by], filters=filters)
+            page = get_figure_cache().get(
+                figure_key(tab, cube.version, (by, *filters.items())), lambda: rates_chart(table, by)
+            )
+            instruments.add_payload(len(page))
+            st.iframe(page, height=FIGURE_HEIGHT)
+            st.dataframe(table.round(1), hide_index=True)
+
+    elif tab == "Cross-filter Explorer":
+        st.subheader("Cross-filter Explorer")
+        st.markdown("Click an injury type or age group, or tick a sex, to filter every chart at once.")
+
+        # One page with the H1 and D2 cubes as typed arrays: the browser filters
+        # and re-aggregates them itself, so clicks never rerun the app
+        tasks = [cube_task(file_path, table_ref) for table_ref in ('H1', 'D2')]
+        if wait_for(loader, tasks, "Loading tables H1 and D2..."):
+            with stage('load'):
+                cubes = {table_ref: loader.result(task) for table_ref, task in zip(('H1', 'D2'), tasks)}
+            page = get_figure_cache().get(
+                figure_key(tab, tuple(cube.version for cube in cubes.values())), lambda: crossfilter_page(cubes)
+            )
+            instruments.add_payload(len(page))
+            st.iframe(page, height=CROSSFILTER_HEIGHT)
+
+    elif tab == "Data Tables":
+        st.subheader("AIHW Data Tables")
+
+        # Pick any workbook and sheet; only the chosen sheet is loaded
+        workbooks = {describe(workbook): workbook for workbook in registry.workbooks}
+        workbook = workbooks[st.selectbox("Workbook", list(workbooks))]
+        sheets = {sheet['name']: sheet for sheet in workbook['sheets']}
+        sheet_name = st.selectbox(
+            "Sheet", list(sheets),
+            format_func=lambda name: f"{name} ({sheets[name]['dimension']})" if sheets[name]['dimension'] else name
+        )
+        st.dataframe(registry.sheet(workbook['path'], sheet_name))
+
+    elif tab == "Insights":
+        st.subheader("Injury Data Insights")
+        st.markdown("""
+            Based on the data visualized above, the following insights can be observed:
         
-        1. **Falls are the most common type of injury** across all age groups. This is the leading cause of injury, as seen in both the bar and pie charts of injury types.
+            1. **Falls are the most common type of injury** across all age groups. This is the leading cause of injury, as seen in both the bar and pie charts of injury types.
         
-        2. **The frequency of fall-related injuries increases with age**. The interactive stacked bar chart and the percentage breakdown by age group reveal a significant rise in fall injuries among older age groups, particularly in people over 65 years of age.
+            2. **The frequency of fall-related injuries increases with age**. The interactive stacked bar chart and the percentage breakdown by age group reveal a significant rise in fall injuries among older age groups, particularly in people over 65 years of age.
         
-        3. **Age Groups and Their Vulnerability**: Older adults (65+) tend to experience a higher proportion of fall-related injuries compared to younger groups. This trend is consistent across multiple visualizations, indicating a potential area for targeted injury prevention strategies.
+            3. **Age Groups and Their Vulnerability**: Older adults (65+) tend to experience a higher proportion of fall-related injuries compared to younger groups. This trend is consistent across multiple visualizations, indicating a potential area for targeted injury prevention strategies.
         
-        ### Recommendations:
-        - Public health initiatives should focus on **preventing falls among the elderly**.
-        - More resources can be dedicated to improving **safety in environments** where older adults spend time (e.g., homes, healthcare facilities).
-    """)
-
-elif tab == "References":
-    st.subheader("Data Source References")
-    st.markdown("""
-        The data used in this application is sourced from the Australian Institute of Health and Welfare (AIHW). 
-        You can access the full dataset and report at the following link:
+            ### Recommendations:
+            - Public health initiatives should focus on **preventing falls among the elderly**.
+            - More resources can be dedicated to improving **safety in environments** where older adults spend time (e.g., homes, healthcare facilities).
+        """)
+
+    elif tab == "References":
+        st.subheader("Data Source References")
+        st.markdown("""
+            The data used in this application is sourced from the Australian Institute of Health and Welfare (AIHW). 
+            You can access the full dataset and report at the following link:
         
-        [AIHW - Injury in Australia](https://www.aihw.gov.au/reports/injury/injury-in-australia/data)
+            [AIHW - Injury in Australia](https://www.aihw.gov.au/reports/injury/injury-in-australia/data)
         
-        This dataset provides comprehensive information about injuries in Australia, including data about injury types, 
-        demographics, and geographical distribution.
+            This dataset provides comprehensive information about injuries in Australia, including data about injury types, 
+            demographics, and geographical distribution.
         
-        Please visit the above link for more detailed information and additional context regarding the data used in this application.
-    """)
+            Please visit the above link for more detailed information and additional context regarding the data used in this application.
+        """)
+
+    elif tab == "Contact":
+        st.header("Contact Me")
+        st.write("""
+            ## Get in Touch
 
-elif tab == "Contact":
-    st.header("Contact Me")
-    st.write("""
-        ## Get in Touch
+            If you have any questions or feedback about the Flight Fare Prediction Tool, feel free to reach out to me. I am always happy to help!
 
-        If you have any questions or feedback about the Flight Fare Prediction Tool, feel free to reach out to me. I am always happy to help!
+            **GitHub:**
+            - Check out our repository on [GitHub](https://github.com/buithehai1994/fall) for updates, issues, and contributions.
 
-        **GitHub:**
-        - Check out our repository on [GitHub](https://github.com/buithehai1994/fall) for updates, issues, and contributions.
+            I value your feedback! Let me know how I can improve the app or any additional features you'd like to see.
+        """)
 
-        I value your feedback! Let me know how I can improve the app or any additional features you'd like to see.
-    """)
+admin_panel('app')
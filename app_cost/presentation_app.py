@@ -1,229 +1,88 @@
-import streamlit as st
-import streamlit.components.v1 as components
-
-# Set page configuration (must be the first Streamlit command)
-st.set_page_config(page_title="Fall Expenditure Presentation", layout="wide")
-
-# Inject custom CSS for responsive layout and better positioning
-st.markdown(
-    """
-    <style>
-        /* Customizing the progress bar */
-        .progress-bar {
-            width: 100%;
-            height: 20px;
-            background-color: #f0f0f0;
-            border-radius: 10px;
-            margin-top: 5px;
-        }
-
-        .progress-bar-fill {
-            height: 100%;
-            background-color: #4caf50;
-            border-radius: 10px;
-            transition: width 0.3s ease;
-        }
-
-        /* Styling the slide titles */
-        h1 {
-            font-size: 2.5em;
-            font-weight: bold;
-            color: #333;
-            text-align: center;
-            margin-top: 0;
-        }
-
-        h3 {
-            font-size: 1.5em;
-            color: #555;
-            text-align: center;
-            margin-top: -5px;
-        }
-
-        /* Navigation button styling */
-        .stButton button {
-            background-color: #007bff;
-            color: white;
-            border: none;
-            padding: 10px 20px;
-            font-size: 16px;
-            border-radius: 5px;
-            cursor: pointer;
-        }
-
-        .stButton button:disabled {
-            background-color: #ccc;
-        }
-
-        /* Sidebar styles */
-        .css-1d391kg {
-            background-color: #f4f4f4;
-        }
-
-        iframe {
-            width: 100% !important;
-            height: 600px;
-            border: none;
-            margin-top: 10px;
-        }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+import os
+import sys
 
-# Define slides (title and associated HTML files)
-slides = [
-    ("Total Expenditure Over Years", "html_cost/total_expenditure_over_years_line.html"),
-    ("Expenditure Over Year by Area of Expenditure", "html_cost/area_of_expenditure_over_years.html"),
-    ("Details of Expenditure", "html_cost/area_of_expenditure_over_years_bar.html"),
-    ("Total Expenditure and Total Cases by Age Groups", "html_cost/total_expenditure_and_cases_over_age_group.html"),
-    ("Average Expenditure per person by age groups", "html_cost/experditure_per_person_age_group.html"),
-    ("Average Hospital cost vs Home cost per patient by Age Groups", "html_cost/average_hospital_vs_home_cost.html"),
-    ("Total Hospital cost", "html_cost/total_cost_at_hospital.html"),
-    ("Total Hospital cost by age group", "html_cost/cost_category_over_age_group_at_hospital.html"),
-    ("Total Hospital cost by age group stacked bar chart", "html_cost/cost_category_over_age_group_percentage_at_hospital.html"),
-    ("Total Home cost by age group", "html_cost/total_cost_at_home.html"),
-    ("Total Home cost by age group and categories", "html_cost/cost_category_over_age_group_at_home.html"),
-    ("Total Home cost by age group stacked bar chart", "html_cost/cost_category_over_age_group_percentage_at_home.html"),
-    ("Average number of days in hospital for hospitalisations due to falls, by age group and sex, 2019–20", "html_cost/days_in_hospital.html"),
-    ("Total Expenditure per Person for a Day by Age Groups and Gender", "html_cost/average_expenditure_a_day_age_group.html"),
-]
-
-# Title for the presentation
-st.title("Fall Expenditure Presentation")
-
-# Sidebar navigation tabs
-tabs = ["Introduction", "Presentation", "Suggested Solution", "References"]
-selected_tab = st.sidebar.radio("Select a Tab", tabs, index=1)
-
-if selected_tab == "Introduction":
-    # Introduction content
-    st.write(""" 
-        # Welcome to the Fall Expenditure Presentation
-
-        Explore visual insights on Fall Expenditures, including:
-        - Areas of expenditures for fall injuries
-        - Estimated average expenditure per patient
-        
-        Navigate through the slides to view the interactive visualizations.
-    """)
-
-elif selected_tab == "Presentation":
-    # Initialize session state for slide index
-    if 'current_slide' not in st.session_state:
-        st.session_state.current_slide = 0
-
-    # Current slide index
-    current_slide = st.session_state.current_slide
-
-    # Progress bar
-    st.markdown(f"#### Slide {current_slide + 1} of {len(slides)}: {slides[current_slide][0]}")
-    progress_percentage = ((current_slide + 1) / len(slides)) * 100
-    st.markdown(
-        f"""
-        <div class="progress-bar">
-            <div class="progress-bar-fill" style="width: {progress_percentage}%;"></div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    # Navigation buttons
-    col1, col2, col3 = st.columns([1, 5, 1])
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
 
+# Make the shared `fall` package importable when run with `streamlit run`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fall.expenditure import EXPENDITURE_WORKBOOK
+from fall.instrumentation import stage
+from fall.loader import UNIT_COSTS_TASK, boot
+from fall.presentation import run_presentation, wait_for
+from fall.simulator import scenario_cases, simulate
+from fall.uncertainty import sample_costs
+
+
+# Unit-cost arrays are derived once per process, in the background from the
+# first visit (or process boot with python -m fall.loader); sliders only
+# rerun simulate()
+@st.cache_resource(show_spinner=False)
+def get_loader():
+    return boot(('expenditure',))
+
+
+def render_simulator():
+    st.markdown("## What-if Cost Simulator")
+    if not os.path.exists(EXPENDITURE_WORKBOOK):
+        st.info(f"The simulator needs the expenditure summary at `{EXPENDITURE_WORKBOOK}`.")
+        return
+    loader = get_loader()
+    if not wait_for(loader, [UNIT_COSTS_TASK], "Preparing unit costs..."):
+        return
+    with stage('load'):
+        unit_costs = loader.result(UNIT_COSTS_TASK)
+
+    col1, col2 = st.columns(2)
     with col1:
-        if st.button("⬅️ Previous", key="prev", disabled=current_slide == 0):
-            st.session_state.current_slide -= 1
-            st.rerun()
-
-    with col3:
-        if st.button("Next ➡️", key="next", disabled=current_slide == len(slides) - 1):
-            st.session_state.current_slide += 1
-            st.rerun()
-
-    # Display the selected HTML slide
-    slide_title, html_filename = slides[current_slide]
-    try:
-        if slide_title == "Average Hospital cost vs Home cost per patient by Age Groups":
-            # Add explanation for slide 6
-            st.write("""
-            ### Defining Hospital and Home Service Categories
-
-            To better analyze healthcare costs, we categorize services as follows:
-
-            **Hospital Services**
-            - Public hospital outpatient
-            - Public hospital emergency department
-            - Public hospital admitted patient
-            - Private hospital services
-            - Medical imaging
-            - Dental expenditure
-
-            **Home Services**
-            - General practitioner services
-            - Allied health and other services
-            - Pharmaceutical benefits scheme
-            - Pathology
-            - Specialist services
-            """)
-
-        with open(html_filename, 'r', encoding='utf-8') as file:
-            html_content = file.read()
-
-        # Embed HTML content
-        components.html(html_content, height=600, scrolling=True)
-
-    except FileNotFoundError:
-        st.error(f"File not found: {html_filename}")
-
-    # Dropdown for direct slide navigation
-    st.sidebar.markdown("### Go to Slide")
-    slide_index = st.sidebar.selectbox(
-        "Select Slide", 
-        options=range(len(slides)), 
-        format_func=lambda x: f"{x + 1}: {slides[x][0]}",
-        index=current_slide,
-    )
-    if slide_index != current_slide:
-        st.session_state.current_slide = slide_index
-        st.rerun()
-
-elif selected_tab == "Suggested Solution":
-    st.header("Suggested Solution: Camera-Assisted Monitoring Devices")
-    st.markdown("""
-    ### Overview
-    Camera-assisted monitoring devices have emerged as a promising solution to prevent hospital falls. Evidence from various studies supports their effectiveness in reducing fall rates, particularly during overnight shifts and among older patients.
-
-    ### Supporting Evidence
-    - **Quigley et al. (2019)**: Demonstrated that older patients benefited more than younger patients from video monitoring when they actively participated in surveillance of their activities.
-    - **Sand-Jecklin et al. (2018)**: Highlighted positive feedback from nursing staff and video monitoring technicians on the effectiveness of these devices. However, patients and families expressed concerns about privacy.
-    - **Woltsche et al. (2022)**: Reported a significant reduction in overnight falls due to the use of portable video monitoring devices.
-
-    ### Key Benefits
-    - **Fall Reduction**: Studies consistently show reduced fall rates with video-assisted monitoring.
-    - **Real-Time Intervention**: Allows healthcare staff to respond quickly to potential fall risks.
-    - **Improved Safety for Older Patients**: Particularly effective in reducing falls in older patient populations.
-
-    ### Challenges
-    - **Privacy Concerns**: Patients and families have voiced concerns about the impact of video monitoring on privacy, which needs to be addressed through transparent communication and informed consent.
-
-    ### Conclusion
-    Implementing camera-assisted monitoring devices in hospital settings is a viable strategy to enhance patient safety and reduce falls. Addressing privacy concerns and fostering collaboration among patients, families, and healthcare staff are critical for the success of this approach.
-    """)
-    
-elif selected_tab == "References":
-    # References section
-    st.write("""
-        # Data Sources 
-
-        The data and relevant information presented in this presentation is collected from the following sources:
-
-        1. Health & welfare expenditure Data. (n.d.). Australian Institute of Health and Welfare. https://www.aihw.gov.au/reports-data/health-welfare-overview/health-welfare-expenditure/data
-
-        2. Falls in older Australians 2019–20: hospitalisations and deaths among people aged 65 and over, Data. (n.d.). Australian Institute of Health and Welfare. https://www.aihw.gov.au/reports/injury/falls-in-older-australians-2019-20-hospitalisation/data
-             
-        3. Injury in Australia, Data. (15 C.E., November). Australian Institute of Health and Welfare. https://www.aihw.gov.au/reports/injury/injury-in-australia/data
-
-        4. Oriaifo, P. (2023). Camera-assisted monitoring device as a tool to reduce falls in inpatient adults: An integrative review (Doctoral dissertation, Liberty University). Liberty University Digital Commons. https://digitalcommons.liberty.edu/doctoral/4902     
-
-    """)
+        case_growth = st.slider("Change in fall cases (%)", -50, 100, 0, step=5) / 100
+        stay_change = st.slider("Change in length of hospital stay (%)", -50, 50, 0, step=5) / 100
+    with col2:
+        fall_reduction = st.slider("Falls prevented by camera-assisted monitoring (%)", 0, 60, 0, step=5) / 100
+        min_age = st.select_slider("Monitoring applies from age group", options=unit_costs.ages, value=unit_costs.ages[0])
+
+    with stage('aggregate'):
+        baseline = simulate(unit_costs)
+        scenario = simulate(unit_costs, case_growth, stay_change, fall_reduction, unit_costs.ages.index(min_age))
+
+    metrics = st.columns(3)
+    for column, name in zip(metrics, ['Hospital', 'Home']):
+        total = scenario[name].sum()
+        column.metric(f"Cost at {name}", f"${total:,.0f}", f"{total - baseline[name].sum():+,.0f}", delta_color="inverse")
+    metrics[2].metric("Fall cases", f"{scenario['Cases'].sum():,.0f}", f"{scenario['Cases'].sum() - baseline['Cases'].sum():+,.0f}", delta_color="inverse")
+
+    # Monte Carlo interval around the scenario total (10,000 draws, well under a second)
+    if st.checkbox("Show 95% uncertainty interval"):
+        samples = sample_costs(
+            scenario_cases(unit_costs, case_growth, fall_reduction, unit_costs.ages.index(min_age)),
+            unit_costs.hospital_per_day * unit_costs.days * (1 + stay_change),
+            unit_costs.home_per_person,
+        )
+        total = (samples['Hospital'] + samples['Home']).sum(axis=1)
+        lower, upper = np.percentile(total, [2.5, 97.5])
+        st.caption(f"Total cost 95% interval: ${lower:,.0f} to ${upper:,.0f}")
+
+    with stage('figure'):
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=unit_costs.ages, y=scenario['Hospital'], name='At Hospital'))
+        fig.add_trace(go.Bar(x=unit_costs.ages, y=scenario['Home'], name='At Home'))
+        fig.add_trace(go.Scatter(
+            x=unit_costs.ages, y=baseline['Hospital'] + baseline['Home'], name='Current total',
+            mode='lines+markers', line=dict(color='black', dash='dash')
+        ))
+        fig.update_layout(
+            barmode='stack', title='Hospital and Home Cost by Age Group', xaxis_title='Age Group',
+            yaxis_title='Expenditure ($)', yaxis_tickformat=',.0f'
+        )
+    # st.plotly_chart serializes the figure
+    with stage('serialize'):
+        st.plotly_chart(fig, width='stretch')
+
+
+# Start preparing the unit costs before the simulator tab is opened
+get_loader()
+
+# Slides, tabs and layout are defined in the deck manifest
+run_presentation("decks/expenditure.json", custom_tabs={"What-if Simulator": render_simulator})
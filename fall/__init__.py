@@ -0,0 +1 @@
+# Shared data and presentation helpers for the fall injury apps
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from fall.instrumentation import METRICS_DIR, STAGES, recorder
+
+
+# Hidden performance panel: drawn only when instrumentation is on
+# (FALL_INSTRUMENT=1) and the page is opened with ?admin in its URL. Shows the
+# previous rerun of page (this one is still running), quantiles of recent
+# reruns and cache hit rates, and exports them for Prometheus or as JSON.
+def admin_panel(page):
+    instruments = recorder()
+    if not instruments.enabled or 'admin' not in st.query_params:
+        return
+
+    with st.sidebar.expander("Performance", expanded=True):
+        last = instruments.last_rerun(page)
+        if last is not None:
+            st.markdown(f"**Previous rerun:** {last['seconds'] * 1000:,.1f} ms, {last['payload_bytes']:,} bytes sent")
+            st.dataframe(pd.DataFrame({
+                'Stage': STAGES,
+                'ms': [last['stages'].get(name, 0.0) * 1000 for name in STAGES],
+            }), hide_index=True)
+
+        summary = instruments.summary()
+        info = summary['pages'].get(page)
+        if info:
+            st.markdown(f"**Last {info['reruns']} reruns (ms)**")
+            st.dataframe(pd.DataFrame({
+                name: {q: seconds * 1000 for q, seconds in info['stages'].get(name, {}).items()}
+                for name in STAGES
+            }).T.rename(columns=lambda q: f'p{float(q) * 100:g}'))
+
+        if summary['caches']:
+            st.markdown("**Caches**")
+            st.dataframe(pd.DataFrame([
+                {'Cache': name, 'Hits': counts['hits'], 'Misses': counts['misses'],
+                 'Hit ratio': counts['hits'] / max(1, counts['hits'] + counts['misses'])}
+                for name, counts in summary['caches'].items()
+            ]), hide_index=True)
+
+        st.download_button("Prometheus metrics", instruments.to_prometheus(), file_name='fall_metrics.prom')
+        st.download_button("JSON", instruments.to_json(), file_name='fall_metrics.json')
+        if st.button("Write to file"):
+            for name in ('metrics.prom', 'metrics.json'):
+                path = instruments.export(os.path.join(METRICS_DIR, f'{page}-{os.getpid()}-{name}'))
+                st.caption(f"Wrote `{path}`")
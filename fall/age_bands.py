@@ -0,0 +1,108 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Lower edges of the bands of each granularity; the last band is open-ended.
+#   5-year   the H1 injury tables, up to 95+
+#   85+      the expenditure summary and population projections
+#   H2       the broad bands of the crude-rate table
+#   broad    children, working age and older people (days in hospital)
+GRANULARITIES = {
+    '5-year': list(range(0, 100, 5)),
+    '85+': list(range(0, 90, 5)),
+    'H2': [0, 5, 15, 25, 45, 65],
+    'broad': [0, 15, 65],
+}
+
+# "0-4", "1–4 years", "95+", "85 years and over", "<1 year"
+_RANGE = re.compile(r'^(\d+)\s*[-–]\s*(\d+)(?: years?)?$')
+_OPEN = re.compile(r'^(\d+)(?:\+| years? and over| and over)$')
+_UNDER = re.compile(r'^<\s*(\d+)(?: years?)?$')
+
+
+# Parse an age label from any of the source vocabularies into [lower, upper)
+# in years, upper None when open-ended. Totals and 'Not reported' give None.
+def parse_band(label):
+    label = str(label).strip()
+    match = _RANGE.match(label)
+    if match:
+        return int(match.group(1)), int(match.group(2)) + 1
+    match = _OPEN.match(label)
+    if match:
+        return int(match.group(1)), None
+    match = _UNDER.match(label)
+    if match:
+        return 0, int(match.group(1))
+    return None
+
+
+# Canonical label of a band: ASCII hyphen, no unit, "85+" when open-ended,
+# "<1" for infants
+def format_band(lower, upper):
+    if upper is None:
+        return f'{lower}+'
+    if upper == lower + 1:
+        return '<1' if lower == 0 else str(lower)
+    return f'{lower}-{upper - 1}'
+
+
+# Labels of a granularity, youngest first
+@lru_cache(maxsize=None)
+def band_labels(granularity):
+    edges = GRANULARITIES[granularity]
+    return tuple(format_band(lower, upper) for lower, upper in zip(edges, [*edges[1:], None]))
+
+
+# Code in the target granularity for each source label, -1 where the label is
+# not an age band or straddles two target bands (e.g. 5-14 into 5-year bands).
+# Compiled once per vocabulary and target.
+@lru_cache(maxsize=None)
+def compile_mapping(labels, granularity):
+    edges = np.array(GRANULARITIES[granularity])
+    codes = np.full(len(labels), -1, dtype=np.int8)
+    for position, label in enumerate(labels):
+        band = parse_band(label)
+        if band is None:
+            continue
+        lower, upper = band
+        code = np.searchsorted(edges, lower, side='right') - 1
+        last_age = np.inf if upper is None else upper - 1
+        code_upper = np.searchsorted(edges, last_age, side='right') - 1
+        if code == code_upper:
+            codes[position] = code
+    return codes
+
+
+def _codes_and_labels(ages):
+    if isinstance(ages, pd.Series):
+        ages = ages.array
+    if isinstance(ages, pd.Categorical):
+        return ages.codes, tuple(str(category) for category in ages.categories)
+    codes, uniques = pd.factorize(ages)
+    return codes, tuple(str(label) for label in uniques)
+
+
+# Map age labels from any vocabulary onto a granularity as an ordered
+# Categorical. Only the distinct labels are parsed; rows are mapped by code.
+def harmonize(ages, granularity):
+    codes, labels = _codes_and_labels(ages)
+    mapping = np.append(compile_mapping(labels, granularity), -1)
+    return pd.Categorical.from_codes(mapping[codes], categories=list(band_labels(granularity)), ordered=True)
+
+
+# Integer band codes (-1 for unmapped), for merging tables on age
+def age_codes(ages, granularity):
+    return harmonize(ages, granularity).codes
+
+
+# Rewrite labels in canonical form without changing the bands themselves
+def canonical_labels(ages):
+    codes, labels = _codes_and_labels(ages)
+    canonical = []
+    for label in labels:
+        band = parse_band(label)
+        canonical.append(label if band is None else format_band(*band))
+    canonical.append(None)
+    return pd.Series(np.array(canonical, dtype=object)[codes], index=getattr(ages, 'index', None))
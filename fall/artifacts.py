@@ -0,0 +1,303 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import warnings
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fall.figures import FIGURE_DIRS, PLOTLY_VERSION, STATIC_DIRS, bundle_name, extract_figure, render_figure
+
+# Optional: objects are also stored brotli-compressed for clients that accept it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressed objects and the manifest naming them, rebuilt from FIGURE_DIRS by pack()
+ARTIFACT_DIR = os.path.join('.cache', 'artifacts')
+
+# Port the presentation apps serve objects on (unset: slides are sent inline)
+PORT_VARIABLE = 'FALL_ARTIFACT_PORT'
+
+# Public address of that server when browsers reach it through a proxy
+# (default: the app's host name on the port above)
+URL_VARIABLE = 'FALL_ARTIFACT_URL'
+
+# Objects never change under their digest, so browsers may keep them for good
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+# Slide page that loads the figure and the plotly.js bundle from the object
+# server, so the browser fetches each compressed once and reuses it from its cache
+STUB_TEMPLATE = """<div id="figure" style="width:100%;height:100%;"></div>
+<script>
+    var base = {base_json};
+    if (!base) {{
+        var page = new URL(document.baseURI);
+        base = page.protocol + "//" + page.hostname + ":{port}";
+    }}
+    var script = document.createElement("script");
+    script.src = base + "/objects/{bundle}";
+    script.onload = function () {{
+        fetch(base + "/objects/{figure}").then(function (response) {{ return response.json(); }}).then(function (figure) {{
+            Plotly.newPlot("figure", figure.data, figure.layout, figure.config || {{"responsive": true}});
+        }});
+    }};
+    document.head.appendChild(script);
+</script>
+"""
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+# Slide figures and pages stored once per distinct content, gzip-compressed
+# (plus brotli when available) under the SHA-256 of their bytes. The manifest
+# maps each slide path the decks use (html/....html) to the digest of its
+# figure JSON, or of the page itself for slides without a figure, and each
+# plotly.js release the figures target to the digest of its bundle.
+class ArtifactStore:
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self._manifest = None
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest, encoding='gzip'):
+        suffix = {'gzip': '.gz', 'br': '.br'}[encoding]
+        return os.path.join(self.root, 'objects', digest[:2], digest + suffix)
+
+    # Store data (once) and return its digest
+    def put(self, data, content_type, objects):
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self._object_path(digest)):
+            _write_atomic(self._object_path(digest), gzip.compress(data, 9, mtime=0))
+        if brotli is not None and not os.path.exists(self._object_path(digest, 'br')):
+            _write_atomic(self._object_path(digest, 'br'), brotli.compress(data))
+        objects[digest] = {'type': content_type, 'size': len(data)}
+        return digest
+
+    @property
+    def manifest(self):
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {'paths': {}, 'objects': {}, 'bundles': {}, 'figures': {}, 'sources': {}}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                    self._manifest = json.load(file)
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    # Digest of a slide path, or None when the store does not hold it
+    def resolve(self, path):
+        return self.manifest['paths'].get(path)
+
+    def info(self, digest):
+        return self.manifest['objects'].get(digest)
+
+    # Stored bytes of an object as compressed on disk (the encodings the store holds)
+    def compressed(self, digest, encoding='gzip'):
+        with open(self._object_path(digest, encoding), 'rb') as file:
+            return file.read()
+
+    def has_encoding(self, digest, encoding):
+        return os.path.exists(self._object_path(digest, encoding))
+
+    def read(self, digest):
+        return gzip.decompress(self.compressed(digest))
+
+    # Slide page of path: figures render inline with the bundle from
+    # app/static, or, given an object server, as a stub that fetches both
+    # from it. Raises FileNotFoundError for paths the store does not hold.
+    def slide_page(self, path, base_url=None, port=None):
+        digest = self.resolve(path)
+        if digest is None:
+            raise FileNotFoundError(path)
+        if self.info(digest)['type'] != 'application/json':
+            return self.read(digest).decode('utf-8')
+        bundle = self.manifest['bundles'].get(self.manifest['figures'][digest])
+        if (base_url is None and port is None) or bundle is None:
+            return render_figure(json.loads(self.read(digest)))
+        return STUB_TEMPLATE.format(base_json=json.dumps(base_url), port=port, bundle=bundle, figure=digest)
+
+    # Bring the store up to date with the slide files of figure_dirs. Each
+    # figure's JSON export is used when it exists, otherwise the figure is
+    # extracted from its HTML, dropping the plotly.js copy embedded in it; a
+    # page without a figure is stored as it is. Files unchanged since the last
+    # pack are not read again. Returns the manifest.
+    def pack(self, figure_dirs=FIGURE_DIRS, static_dirs=STATIC_DIRS):
+        previous = self.manifest
+        sources = previous.get('sources', {})
+        manifest = {'paths': {}, 'objects': {}, 'bundles': {}, 'figures': {}, 'sources': {}}
+
+        for folder in figure_dirs:
+            if not os.path.isdir(folder):
+                continue
+            names = set(os.listdir(folder))
+            for name in sorted(names):
+                stem, extension = os.path.splitext(name)
+                if extension == '.json' or (extension == '.html' and stem + '.json' not in names):
+                    path = os.path.join(folder, stem + '.html')
+                    source = os.path.join(folder, name)
+                    self._pack_slide(path, source, sources.get(source), previous, manifest)
+
+        for version in sorted(set(manifest['figures'].values())):
+            bundle = _bundle_source(version, static_dirs)
+            if bundle is None:
+                warnings.warn(f"No plotly.js {version} bundle to store; install it with python -m fall.figures")
+                continue
+            with open(bundle, 'rb') as file:
+                manifest['bundles'][version] = self.put(file.read(), 'text/javascript', manifest['objects'])
+
+        _write_atomic(self.manifest_path, json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+        return manifest
+
+    def _pack_slide(self, path, source, known, previous, manifest):
+        stat = os.stat(source)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        if known is not None and known['stamp'] == stamp and os.path.exists(self._object_path(known['digest'])):
+            digest = known['digest']
+            manifest['objects'][digest] = previous['objects'][digest]
+            if digest in previous['figures']:
+                manifest['figures'][digest] = previous['figures'][digest]
+        else:
+            figure = None
+            if source.endswith('.json'):
+                with open(source, 'r', encoding='utf-8') as file:
+                    figure = json.load(file)
+            else:
+                figure = extract_figure(source)
+            if figure is None:
+                with open(source, 'rb') as file:
+                    digest = self.put(file.read(), 'text/html', manifest['objects'])
+            else:
+                figure.setdefault('plotly_version', PLOTLY_VERSION)
+                data = json.dumps(figure, separators=(',', ':')).encode('utf-8')
+                digest = self.put(data, 'application/json', manifest['objects'])
+                manifest['figures'][digest] = figure['plotly_version']
+        manifest['paths'][path] = digest
+        manifest['sources'][source] = {'stamp': stamp, 'digest': digest}
+
+
+# plotly.js file of a release: the copy in the static folders, or the
+# installed plotly package's when it is that release
+def _bundle_source(version, static_dirs=STATIC_DIRS):
+    for folder in static_dirs:
+        path = os.path.join(folder, bundle_name(version))
+        if os.path.exists(path):
+            return path
+    from plotly.offline import get_plotlyjs_version
+    if version == get_plotlyjs_version():
+        return os.path.join(os.path.dirname(__import__('plotly').__file__), 'package_data', 'plotly.min.js')
+    return None
+
+
+# The store shared by every session of the process
+@lru_cache(maxsize=None)
+def shared_store():
+    return ArtifactStore()
+
+
+# Serve the store's objects on a daemon thread:
+#   GET /objects/<digest>   the object, as stored (brotli or gzip) when the
+#                           client accepts it, with its digest as ETag and
+#                           CACHE_CONTROL; 304 when If-None-Match matches
+@lru_cache(maxsize=None)
+def artifact_server(port, host='0.0.0.0'):
+    store = shared_store()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self._respond(head=True)
+
+        def do_GET(self):
+            self._respond(head=False)
+
+        def _respond(self, head):
+            parts = self.path.split('?')[0].strip('/').split('/')
+            digest = parts[1] if len(parts) == 2 and parts[0] == 'objects' else ''
+            info = store.info(digest) if DIGEST.match(digest) else None
+            if info is None:
+                self.send_error(404)
+                return
+
+            etag = f'"{digest}"'
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send_response(304)
+                self._common_headers(etag)
+                self.end_headers()
+                return
+
+            accepted = [value.split(';')[0].strip() for value in self.headers.get('Accept-Encoding', '').split(',')]
+            if 'br' in accepted and store.has_encoding(digest, 'br'):
+                encoding, body = 'br', store.compressed(digest, 'br')
+            elif 'gzip' in accepted:
+                encoding, body = 'gzip', store.compressed(digest)
+            else:
+                encoding, body = None, store.read(digest)
+
+            self.send_response(200)
+            self._common_headers(etag)
+            self.send_header('Content-Type', f"{info['type']}; charset=utf-8")
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(body)
+
+        def _common_headers(self, etag):
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', CACHE_CONTROL)
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Access-Control-Allow-Origin', '*')
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as error:
+        warnings.warn(f"Artifact server not started on port {port}: {error}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fall-artifacts', daemon=True).start()
+    return server
+
+
+# Sizes of the slide folders against the store, in bytes
+def disk_usage(figure_dirs=FIGURE_DIRS, root=ARTIFACT_DIR):
+    def size(folder):
+        return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(folder) for name in names)
+    return {'sources': sum(size(folder) for folder in figure_dirs if os.path.isdir(folder)), 'store': size(root)}
+
+
+#   python -m fall.artifacts                 pack html/ and html_cost/ into the store
+#   python -m fall.artifacts --serve 8602    and serve its objects until interrupted
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack slide figures into the compressed artifact store.')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='serve the objects on this port afterwards')
+    args = parser.parse_args()
+
+    manifest = shared_store().pack()
+    usage = disk_usage()
+    print(f"{len(manifest['paths'])} slides, {len(manifest['objects'])} objects: "
+          f"{usage['sources'] / 1e6:,.1f} MB of slide files stored in {usage['store'] / 1e6:,.2f} MB")
+    if args.serve:
+        server = artifact_server(args.serve)
+        if server is not None:
+            print(f"Serving {ARTIFACT_DIR} on port {args.serve}")
+            threading.Event().wait()
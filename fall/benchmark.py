@@ -0,0 +1,347 @@
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from functools import cached_property
+
+import pandas as pd
+
+from fall import expenditure, ingest, plotting, rates, synthetic
+from fall.artifacts import ArtifactStore
+from fall.crossfilter import crossfilter_page
+from fall.cube import DIMENSION_COLUMNS, VALUE_COLUMN, AggregateCube
+from fall.deck import load_deck
+from fall.figure_cache import figure_page
+from fall.figures import read_slide
+from fall.measures import MACHINE_READABLE_WORKBOOK
+from fall.slide_cache import SlideCache
+from fall.table_store import TableStore
+
+# Stored medians every run is compared against
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+# A benchmark is a regression when its median is this many times its baseline
+REGRESSION_THRESHOLD = 1.25
+
+# Each benchmark runs at least MIN_RUNS times and stops after MAX_RUNS or once
+# it has spent TIME_BUDGET seconds
+MIN_RUNS = 3
+MAX_RUNS = 20
+TIME_BUDGET = 2.0
+
+# Scales below this many rows also time parsing the workbook (.xlsx holds at
+# most 1,048,576 rows a sheet, and writing one is slow)
+XLSX_MAX_ROWS = 100_000
+
+DECKS = [os.path.join('decks', 'population.json'), os.path.join('decks', 'expenditure.json')]
+
+# Chart tabs of app/app.py: table, x, colour and the dimension shares are taken within
+APP_TABS = {
+    'injuries_by_type': ('H1', 'Injury Type', None, None),
+    'cases_by_age_stacked': ('H1', 'Age Group', 'Injury Type', None),
+    'cases_by_age_percentage': ('H1', 'Age Group', 'Injury Type', 'Age Group'),
+    'annual_cases': ('D2', 'Year', 'Injury Type', None),
+}
+
+# name -> {'function', 'scales'}, filled by @benchmark
+BENCHMARKS = {}
+
+
+# Register a benchmark. function(workload) does the setup and returns the
+# callable that is timed; scales limits the scales it runs at (None: all).
+def benchmark(name, scales=None):
+    def register(function):
+        BENCHMARKS[name] = {'function': function, 'scales': scales}
+        return function
+    return register
+
+
+# Synthetic inputs at one scale, each built on first use and shared by the
+# benchmarks of that scale
+class Workload:
+    def __init__(self, scale, seed=0):
+        self.scale = scale
+        self.seed = seed
+
+    @cached_property
+    def machine_readable(self):
+        template = ingest.read_workbook(MACHINE_READABLE_WORKBOOK)
+        return template if self.scale == 1 else synthetic.machine_readable(self.scale, self.seed, template)
+
+    @cached_property
+    def store(self):
+        return TableStore(self.machine_readable)
+
+    @cached_property
+    def cube(self):
+        return AggregateCube.from_store(self.store)
+
+    # Detail rows of each cube table, with the cube's dimension names
+    def base(self, table_ref):
+        table = self.store.get_table(table_ref, exclude_totals=True)
+        columns = DIMENSION_COLUMNS[table_ref]
+        base = pd.DataFrame({dim: table[column] for dim, column in columns.items()})
+        base[VALUE_COLUMN] = table['MeasureValueNumber'].to_numpy()
+        return base
+
+    @cached_property
+    def expenditure(self):
+        return synthetic.expenditure_summary(self.scale, self.seed)
+
+    # Cleaned once, checking that every stratum of the summary came through:
+    # rows cleaning drops would leave the benchmarks timing less work
+    @cached_property
+    def cleaned_expenditure(self):
+        cleaned = expenditure.clean_expenditure(self.expenditure)
+        summary = self.expenditure
+        known = summary[(summary['Age groups'] != expenditure.NOT_REPORTED) & (summary['Sex'] != expenditure.NOT_REPORTED)]
+        assert len(cleaned) == len(known), f'cleaning kept {len(cleaned):,} of {len(known):,} expenditure strata'
+        return cleaned
+
+    @cached_property
+    def fall_cases(self):
+        return expenditure.fall_cases()
+
+    def rows(self, name):
+        if name.startswith('expenditure'):
+            return len(self.expenditure)
+        if name.startswith('slides'):
+            return None
+        return len(self.machine_readable)
+
+
+@benchmark('ingest_xlsx')
+def ingest_xlsx(workload):
+    if len(workload.machine_readable) > XLSX_MAX_ROWS:
+        return None
+    folder = tempfile.mkdtemp(prefix='fall-benchmark-')
+    path = os.path.join(folder, 'AIHW_INJCAT213_Machine_readable_synthetic.xlsx')
+    workload.machine_readable.to_excel(path, index=False)
+
+    def run():
+        try:
+            ingest.convert_workbook(path)
+        finally:
+            shutil.rmtree(ingest._cache_folder(path), ignore_errors=True)
+    run.cleanup = lambda: shutil.rmtree(folder, ignore_errors=True)
+    return run
+
+
+@benchmark('table_store')
+def table_store(workload):
+    frame = workload.machine_readable
+    return lambda: TableStore(frame)
+
+
+# What fall.loader builds for app/app.py, without the compute cache
+@benchmark('load_data')
+def load_data(workload):
+    store = workload.store
+    return lambda: AggregateCube.from_store(store)
+
+
+# Reducing the raw detail rows to each tab's plotted grain (what the cube
+# precomputes), and building plus serializing the tab's figure from the cube
+def _register_tab(tab, table_ref, x, color, percent_of):
+    @benchmark(f'aggregate/{tab}')
+    def aggregate(workload):
+        base = workload.base(table_ref)
+        return lambda: plotting.reduce(base, x, VALUE_COLUMN, color, percent_of=percent_of)
+
+    @benchmark(f'figure/{tab}')
+    def figure(workload):
+        dims = [x] if color is None else [x, color]
+        sliced = workload.cube.slice(table_ref, dims)
+        return lambda: figure_page(plotting.bar(sliced, x=x, y=VALUE_COLUMN, color=color, percent_of=percent_of))
+
+
+for _tab, _spec in APP_TABS.items():
+    _register_tab(_tab, *_spec)
+
+
+# The typed-array page of the cross-filter tab, built once per release
+@benchmark('crossfilter_page')
+def crossfilter(workload):
+    cubes = dict.fromkeys(DIMENSION_COLUMNS, workload.cube)
+    return lambda: crossfilter_page(cubes)
+
+
+# Crude and age-standardised rates of every injury type and sex at once,
+# for one filter selection, from the cube's finest H1 slice
+@benchmark('rates')
+def rates_by_stratum(workload):
+    counts = workload.cube.slice('H1', ['Injury Type', 'Age Group', 'Sex', 'Year'])
+    population = rates.implied_population()
+    return lambda: rates.rates(counts, population, by=['Injury Type', 'Sex', 'Year'], filters={'Age Group': ('45-64', '65+')})
+
+
+# clean_expenditure and unit_costs: the cleaning and merge path of analysis.ipynb
+@benchmark('expenditure_clean')
+def expenditure_clean(workload):
+    summary = workload.expenditure
+    workload.cleaned_expenditure
+    return lambda: expenditure.clean_expenditure(summary)
+
+
+@benchmark('expenditure_merge')
+def expenditure_merge(workload):
+    cleaned, cases, days = workload.cleaned_expenditure, workload.fall_cases, synthetic.days_in_hospital()
+    return lambda: expenditure.unit_costs(cleaned, cases, days)
+
+
+def _deck_figures():
+    return [path for deck in DECKS for slide in load_deck(deck).slides for path in slide['figures']]
+
+
+# Every slide of the presentation decks read from disk, and served by a warm SlideCache
+@benchmark('slides_cold', scales=(1,))
+def slides_cold(workload):
+    paths = _deck_figures()
+    return lambda: [read_slide(path) for path in paths]
+
+
+# The same slides decompressed from the artifact store the apps read them from
+@benchmark('slides_store', scales=(1,))
+def slides_store(workload):
+    paths = _deck_figures()
+    store = ArtifactStore(tempfile.mkdtemp(prefix='fall-benchmark-'))
+    store.pack()
+    run = lambda: [store.slide_page(path) for path in paths]
+    run.cleanup = lambda: shutil.rmtree(store.root, ignore_errors=True)
+    return run
+
+
+@benchmark('slides_cached', scales=(1,))
+def slides_cached(workload):
+    paths = _deck_figures()
+    cache = SlideCache()
+    for path in paths:
+        cache.get(path)
+    return lambda: [cache.get(path) for path in paths]
+
+
+# Seconds of each run of function
+def measure(function, min_runs=MIN_RUNS, max_runs=MAX_RUNS, time_budget=TIME_BUDGET):
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() - started < time_budget):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+# {name: {scale: {'median', 'min', 'runs', 'rows'}}} for the selected benchmarks
+def run(names=None, scales=(1, *synthetic.SCALES), seed=0, log=print):
+    names = names or list(BENCHMARKS)
+    results = {}
+    for scale in scales:
+        workload = Workload(scale, seed)
+        for name in names:
+            spec = BENCHMARKS[name]
+            if spec['scales'] is not None and scale not in spec['scales']:
+                continue
+            function = spec['function'](workload)
+            if function is None:
+                continue
+            try:
+                times = measure(function)
+            finally:
+                getattr(function, 'cleanup', lambda: None)()
+            result = {
+                'median': statistics.median(times), 'min': min(times), 'runs': len(times), 'rows': workload.rows(name),
+            }
+            results.setdefault(name, {})[str(scale)] = result
+            log(f'{name} x{scale}: {result["median"] * 1000:,.1f} ms')
+    return results
+
+
+def read_baseline(path=BASELINE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)['results']
+    except FileNotFoundError:
+        return {}
+
+
+def write_baseline(results, path=BASELINE_PATH):
+    baseline = {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+# One line per benchmark and scale: median, time per source row, how time
+# grows against rows since the previous scale (1 is linear; the stage stops
+# scaling where this climbs above 1) and the ratio to the baseline. Returns
+# the (name, scale) pairs that regressed.
+def report(results, baseline, threshold=REGRESSION_THRESHOLD, out=sys.stdout):
+    regressions = []
+    out.write(f'{"benchmark":<36} {"scale":>6} {"rows":>10} {"median ms":>11} {"ns/row":>9} {"growth":>7} {"vs base":>8}\n')
+    for name, by_scale in results.items():
+        previous = None
+        for scale, result in sorted(by_scale.items(), key=lambda item: int(item[0])):
+            rows = result['rows']
+            per_row = f'{result["median"] / rows * 1e9:,.0f}' if rows else '-'
+            growth = '-'
+            if previous and rows and previous['rows'] and rows != previous['rows']:
+                growth = f'{math.log(result["median"] / previous["median"]) / math.log(rows / previous["rows"]):.2f}'
+            base = baseline.get(name, {}).get(scale)
+            ratio = '-'
+            if base:
+                value = result['median'] / base['median']
+                ratio = f'{value:.2f}' + (' !' if value > threshold else '')
+                if value > threshold:
+                    regressions.append((name, scale))
+            rows_text = f'{rows:,}' if rows else '-'
+            out.write(f'{name:<36} {scale:>6} {rows_text:>10} {result["median"] * 1000:>11,.1f} {per_row:>9} {growth:>7} {ratio:>8}\n')
+            previous = result
+    return regressions
+
+
+#   python -m fall.benchmark                      run everything, compare with the baseline
+#   python -m fall.benchmark --scales 1 10        only some scales
+#   python -m fall.benchmark load_data --save     update the stored baseline
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the data-to-chart path on real and synthetic data.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, *synthetic.SCALES])
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, spec in BENCHMARKS.items():
+            print(name if spec['scales'] is None else f'{name} (scales {", ".join(map(str, spec["scales"]))})')
+        sys.exit()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(unknown)}')
+
+    results = run(args.names, args.scales, log=lambda line: print(line, file=sys.stderr))
+    baseline = read_baseline(args.baseline)
+    regressions = report(results, baseline, args.threshold)
+    if args.save:
+        merged = {name: dict(baseline.get(name, {}), **by_scale) for name, by_scale in results.items()}
+        write_baseline({**baseline, **merged}, args.baseline)
+        print(f'Saved baseline to {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} regression(s) over {args.threshold:.2f}x the baseline')
+        sys.exit(1)
@@ -0,0 +1,124 @@
+import argparse
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from fall.charts import FIGURES
+from fall.artifacts import shared_store
+from fall.figures import export_figure, figure_path
+from fall.ingest import ensure_cached, sheet_fingerprint
+
+# Fingerprints of the last successful build of each figure
+STATE_PATH = os.path.join('.cache', 'build', 'state.json')
+
+
+def _read_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def _code_fingerprint(modules):
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(inspect.getsource(importlib.import_module(name)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# A figure is rebuilt when the sheets it reads or the code that draws it change
+def figure_fingerprint(spec):
+    digest = hashlib.sha256()
+    for path, sheet in spec['sheets']:
+        digest.update(f'{path}:{sheet}:{sheet_fingerprint(path, sheet)}'.encode('utf-8'))
+    digest.update(_code_fingerprint(spec['uses']).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Split the registered figures into (stale, up to date, skipped). Figures whose
+# source workbook is not in the checkout are skipped and keep their committed JSON.
+def plan(names=None, force=False):
+    state = _read_state()
+    stale, fresh, skipped = {}, [], []
+    for name in names or FIGURES:
+        spec = FIGURES[name]
+        if not all(os.path.exists(path) for path, _ in spec['sheets']):
+            skipped.append(name)
+            continue
+        fingerprint = figure_fingerprint(spec)
+        output_exists = os.path.exists(figure_path(spec['output']))
+        if force or not output_exists or state.get(name) != fingerprint:
+            stale[name] = fingerprint
+        else:
+            fresh.append(name)
+    return stale, fresh, skipped
+
+
+# Runs in a worker process: draw one figure and write its JSON
+def _build_figure(name):
+    start = time.perf_counter()
+    spec = FIGURES[name]
+    export_figure(spec['function'](), figure_path(spec['output']))
+    return name, time.perf_counter() - start
+
+
+# Build every stale figure, in parallel across processes. The columnar cache is
+# filled first so workers only ever read Parquet.
+def build(names=None, force=False, workers=None):
+    names = list(names or FIGURES)
+    unknown = [name for name in names if name not in FIGURES]
+    if unknown:
+        raise KeyError(f"unknown figures: {', '.join(unknown)}")
+
+    for path in {path for name in names for path, _ in FIGURES[name]['sheets'] if os.path.exists(path)}:
+        ensure_cached(path)
+
+    stale, fresh, skipped = plan(names, force)
+    state = _read_state()
+    built = {}
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, seconds in pool.map(_build_figure, stale):
+                built[name] = seconds
+                state[name] = stale[name]
+        _write_state(state)
+        # Apps serve slides from the artifact store; a newer manifest makes them reload
+        shared_store().pack()
+    return built, fresh, skipped
+
+
+#   python -m fall.build                 rebuild figures whose inputs changed
+#   python -m fall.build --force NAME    rebuild the named figures regardless
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build slide figures from the source workbooks.')
+    parser.add_argument('names', nargs='*', help='figures to build (default: all)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if up to date')
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--list', action='store_true', help='print the plan without building')
+    args = parser.parse_args()
+
+    if args.list:
+        stale, fresh, skipped = plan(args.names or None, args.force)
+        for name in FIGURES if not args.names else args.names:
+            status = 'stale' if name in stale else 'fresh' if name in fresh else 'skipped'
+            print(f'{status:8} {name} -> {figure_path(FIGURES[name]["output"])}')
+        sys.exit(0)
+
+    built, fresh, skipped = build(args.names or None, args.force, args.workers)
+    for name, seconds in built.items():
+        print(f'Built {figure_path(FIGURES[name]["output"])} in {seconds:.2f}s')
+    print(f'{len(built)} built, {len(fresh)} up to date, {len(skipped)} skipped (missing source workbook)')
@@ -0,0 +1,439 @@
+from functools import lru_cache
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+from fall import expenditure, plotting, projection, simulator, uncertainty
+from fall.age_bands import band_labels, harmonize
+from fall.table_store import TableStore
+
+MACHINE_READABLE_WORKBOOK = expenditure.MACHINE_READABLE_WORKBOOK
+EXPENDITURE_WORKBOOK = expenditure.EXPENDITURE_WORKBOOK
+
+# name -> {'function', 'output', 'sheets', 'uses'}, filled by @figure
+FIGURES = {}
+
+# Colours used for the injury causes in the notebook charts
+CUSTOM_COLORS = [
+    '#FF6347', '#4682B4', '#FF1493', '#32CD32', '#FFD700', '#8A2BE2', '#A52A2A', '#FF8C00',
+    '#6A5ACD', '#98FB98', '#D2691E', '#C71585', '#40E0D0', '#00BFFF', '#000000'
+]
+
+AGE_GROUPS = list(band_labels('5-year'))
+
+
+# Register a function returning a Plotly figure. output is the slide path the
+# figure replaces (its JSON is written next to it), sheets the (workbook,
+# sheet) pairs it reads, and uses the modules whose code it depends on.
+def figure(output, sheets, uses=()):
+    def register(function):
+        FIGURES[function.__name__] = {
+            'function': function,
+            'output': output,
+            'sheets': list(sheets),
+            'uses': [function.__module__, *uses],
+        }
+        return function
+    return register
+
+
+INJURY_SHEETS = [(MACHINE_READABLE_WORKBOOK, 0)]
+EXPENDITURE_SHEETS = [
+    (EXPENDITURE_WORKBOOK, expenditure.SUMMARY_SHEET),
+    (EXPENDITURE_WORKBOOK, expenditure.DAYS_IN_HOSPITAL_SHEET),
+    (MACHINE_READABLE_WORKBOOK, 0),
+]
+INJURY_CODE = ['fall.plotting', 'fall.age_bands', 'fall.table_store', 'fall.ingest']
+EXPENDITURE_CODE = ['fall.expenditure', 'fall.age_bands', 'fall.measures', 'fall.table_store', 'fall.ingest']
+
+
+# Loaders are cached per process, so figures built by the same worker share them
+@lru_cache(maxsize=None)
+def _table(table_ref):
+    table = TableStore.from_workbook(MACHINE_READABLE_WORKBOOK).get_table(table_ref, exclude_totals=True)
+    table = table.rename(columns={
+        'MeasureValueNumber': 'Number of Cases',
+        'ReportingCategory2': 'Injury Type',
+        'ReportingCategory4': 'Age Group' if table_ref == 'H1' else 'ReportingCategory4',
+    })
+    if table_ref == 'H1':
+        table['Age Group'] = harmonize(table['Age Group'], '5-year')
+    return table
+
+
+@lru_cache(maxsize=None)
+def _expenditure():
+    return expenditure.clean_expenditure(expenditure.load_expenditure_summary())
+
+
+@lru_cache(maxsize=None)
+def _unit_costs():
+    return expenditure.unit_costs(_expenditure(), expenditure.fall_cases(), expenditure.load_days_in_hospital())
+
+
+@figure('html/injures_by_type_bar_chart.html', INJURY_SHEETS, INJURY_CODE)
+def injuries_by_type_bar_chart():
+    return plotting.bar(_table('H1'), x='Injury Type', y='Number of Cases', title="Total Number of Injuries by Type")
+
+
+@figure('html/injures_by_type_pie_chart.html', INJURY_SHEETS, INJURY_CODE)
+def injuries_by_type_pie_chart():
+    return plotting.pie(_table('H1'), names='Injury Type', values='Number of Cases', title="Total Number of Injuries by Type")
+
+
+@figure('html/injures_by_age_causes_stacked_bar_chart.html', INJURY_SHEETS, INJURY_CODE)
+def injuries_by_age_causes_stacked_bar_chart():
+    fig = plotting.bar(
+        _table('H1'),
+        x='Age Group',
+        y='Number of Cases',
+        color='Injury Type',
+        title="Interactive Stacked Bar Chart of Number of Injury Hospitalisations by Cause, Age Group Australia, 2022–23",
+        color_discrete_sequence=CUSTOM_COLORS
+    )
+    fig.update_layout(barmode='stack', xaxis=dict(categoryorder='array', categoryarray=AGE_GROUPS))
+    return fig
+
+
+@figure('html/injures_by_age_causes_stacked_bar_percentage.html', INJURY_SHEETS, INJURY_CODE)
+def injuries_by_age_causes_stacked_bar_percentage():
+    fig = plotting.bar(
+        _table('H1'),
+        x='Age Group',
+        y='Number of Cases',
+        color='Injury Type',
+        percent_of='Age Group',
+        labels={'Number of Cases': 'Percentage'},
+        title="Interactive Stacked Bar Chart of Percentage of Injury Hospitalisations by Cause, Age Group Australia, 2022–23",
+        color_discrete_sequence=CUSTOM_COLORS
+    )
+    fig.update_layout(
+        barmode='stack',
+        xaxis=dict(categoryorder='array', categoryarray=AGE_GROUPS),
+        yaxis=dict(title="Percentage of Cases", ticksuffix="%")
+    )
+    return fig
+
+
+@figure('html/Age_Standardised_rate_of_death_Injury.html', INJURY_SHEETS, INJURY_CODE)
+def age_standardised_rate_of_death():
+    fig = px.bar(
+        _table('D2'),
+        x="ReportingCategory4",
+        y="Number of Cases",
+        color="ReportingCategory1",
+        labels={"Number of Cases": "ASR (per 100,000 population)", "ReportingCategory4": "Time Period"},
+        text="Number of Cases",
+        facet_col="Injury Type",
+        facet_col_spacing=0.05,
+        barmode="stack",
+    )
+    fig.update_traces(textposition="inside", texttemplate="%{text}", insidetextanchor="middle")
+    fig.update_layout(
+        xaxis_title="Time Period",
+        yaxis_title="Age-standardised rate of deaths due to injuries (per 100,000)",
+        template="plotly_white",
+        legend_title="Gender",
+        showlegend=True,
+        width=1300,
+        height=400,
+        legend=dict(x=0.5, y=-0.6, traceorder="normal", orientation="h", xanchor="center", yanchor="top")
+    )
+    # Keep only the cause in the facet labels, rotated to fit
+    fig.for_each_annotation(lambda a: a.update(
+        text=a.text.split('=')[1] if '=' in a.text else a.text,
+        font=dict(size=12),
+        showarrow=False,
+        align='left',
+        textangle=90,
+        y=0.9 if ('Falls' in a.text or 'Suicide' in a.text) else 0.4
+    ))
+    return fig
+
+
+@figure('html_cost/total_expenditure_over_years_line.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def total_expenditure_over_years_line():
+    by_year = _expenditure().groupby("Year", as_index=False)["Total Expenditure"].sum()
+    return px.line(by_year, x="Year", y="Total Expenditure", title="Total Expenditure Over Years", markers=True)
+
+
+def _expenditure_by_area():
+    return _expenditure().groupby(["Year", "Areas of expenditure"], as_index=False)["Total Expenditure"].sum()
+
+
+@figure('html_cost/area_of_expenditure_over_years.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def area_of_expenditure_over_years():
+    return px.area(
+        _expenditure_by_area(), x='Year', y='Total Expenditure', color='Areas of expenditure',
+        title='Expenditure Over Year by Area of Expenditure',
+        labels={'Areas of expenditure': 'Area of Expenditure'}
+    )
+
+
+@figure('html_cost/area_of_expenditure_over_years_bar.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def area_of_expenditure_over_years_bar():
+    fig = px.bar(
+        _expenditure_by_area(), x="Year", y="Total Expenditure", color="Areas of expenditure",
+        title="Expenditure Over Year by Area of Expenditure",
+        labels={"Areas of expenditure": "Area of Expenditure"},
+        barmode="stack"
+    )
+    fig.update_layout(xaxis=dict(tickmode="linear", tick0=2013, dtick=1))
+    return fig
+
+
+@figure('html_cost/total_expenditure_and_cases_over_age_group.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def total_expenditure_and_cases_over_age_group():
+    summary = expenditure.summarise_by_age(_unit_costs())
+    line_trace = go.Scatter(
+        x=summary['Age Group'], y=summary['Total Expenditure'], mode='lines+markers', name='Total Expenditure',
+        line=dict(shape='linear'), marker=dict(size=6), yaxis='y1',
+        hovertemplate='Expenditure: $%{y:,.0f}<extra></extra>'
+    )
+    bar_trace = go.Bar(
+        x=summary['Age Group'], y=summary['Number of Cases'], name='Number of Cases',
+        marker=dict(color='rgba(246, 78, 139, 0.6)'), yaxis='y2'
+    )
+    layout = go.Layout(
+        title="Expenditure Trends Across Age Groups and Number of Cases",
+        xaxis=dict(title='Age Group'),
+        yaxis=dict(title='Expenditure ($)', tickformat=',.0f', side='left', showgrid=True),
+        yaxis2=dict(title='Number of Cases', overlaying='y', side='right', showgrid=False),
+        barmode='group',
+        hovermode='closest'
+    )
+    return go.Figure(data=[line_trace, bar_trace], layout=layout)
+
+
+@figure('html_cost/experditure_per_person_age_group.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def expenditure_per_person_age_group():
+    summary = expenditure.summarise_by_age(_unit_costs())
+    average_expenditure = summary['Expenditure per Person'].mean()
+    fig = go.Figure(data=[go.Bar(x=summary['Age Group'], y=summary['Expenditure per Person'], name="Expenditure per Person")])
+    fig.add_trace(go.Scatter(
+        x=summary['Age Group'], y=[average_expenditure] * len(summary), mode='lines',
+        name='Average Expenditure', line=dict(color='red', dash='dash')
+    ))
+    fig.update_layout(
+        title="Expenditure per Person by Age Group", xaxis_title="Age Group",
+        yaxis_title="Expenditure per Person", template="plotly_white"
+    )
+    return fig
+
+
+@figure('html_cost/average_hospital_vs_home_cost.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def average_hospital_vs_home_cost():
+    services = expenditure.service_costs_by_age(_unit_costs())
+    age_groups = [column for column in services.columns if column not in ('services', 'category')]
+    hospital = services.loc[services['category'] == 'Hospital', age_groups].sum()
+    home = services.loc[services['category'] == 'Home', age_groups].sum()
+    total = hospital + home
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=age_groups, y=total, fill='tozeroy', name='Total',
+        hovertemplate='Age Group: %{x}<br>Total: %{y:,.2f}<br>At Hospital: %{customdata[0]:,.2f}<extra></extra>',
+        customdata=hospital.to_numpy().reshape(-1, 1)
+    ))
+    fig.add_trace(go.Scatter(
+        x=age_groups, y=home, fill='tonexty', name='At Home',
+        hovertemplate='Age Group: %{x}<br>At Home: %{y:,.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title='Average Hospital cost vs Home cost per patient by Age Group',
+        xaxis_title='Age Group', yaxis_title='Count', template='plotly_dark'
+    )
+    return fig
+
+
+# Long form of the service costs of one category, optionally as percentages
+# of each age group
+def _service_costs(category, percentage=False):
+    services = expenditure.service_costs_by_age(_unit_costs())
+    services = services[services['category'] == category]
+    age_groups = [column for column in services.columns if column not in ('services', 'category')]
+    if percentage:
+        services = services.copy()
+        services[age_groups] = services[age_groups].div(services[age_groups].sum(axis=0), axis=1) * 100
+    value_name = 'Percentage' if percentage else 'Value'
+    return services.melt(id_vars=['services'], value_vars=age_groups, var_name='Age Group', value_name=value_name)
+
+
+def _total_service_cost(category, where):
+    df_total = _service_costs(category).groupby('Age Group', as_index=False, sort=False)['Value'].sum()
+    return px.area(
+        df_total, x='Age Group', y='Value', labels={'Value': 'Total Service Value'},
+        title=f"Total Service Value Across Age Groups {where}"
+    )
+
+
+def _service_cost_by_category(category, where):
+    return px.area(
+        _service_costs(category), x='Age Group', y='Value', color='services',
+        title=f"Service Value Across Age Groups {where}", line_group='services'
+    )
+
+
+def _service_cost_percentage(category, where):
+    return px.area(
+        _service_costs(category, percentage=True), x='Age Group', y='Percentage', color='services',
+        labels={'Percentage': 'Percentage (%)'},
+        title=f"Service Percentage Distribution Across Age Groups {where}", line_group='services'
+    )
+
+
+@figure('html_cost/total_cost_at_hospital.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def total_cost_at_hospital():
+    return _total_service_cost('Hospital', 'at Hospital')
+
+
+@figure('html_cost/cost_category_over_age_group_at_hospital.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def cost_category_over_age_group_at_hospital():
+    return _service_cost_by_category('Hospital', 'at Hospital')
+
+
+@figure('html_cost/cost_category_over_age_group_percentage_at_hospital.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def cost_category_over_age_group_percentage_at_hospital():
+    return _service_cost_percentage('Hospital', 'at Hospital')
+
+
+@figure('html_cost/total_cost_at_home.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def total_cost_at_home():
+    return _total_service_cost('Home', 'at Home')
+
+
+@figure('html_cost/cost_category_over_age_group_at_home.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def cost_category_over_age_group_at_home():
+    return _service_cost_by_category('Home', 'at Home')
+
+
+@figure('html_cost/cost_category_over_age_group_percentage_at_home.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def cost_category_over_age_group_percentage_at_home():
+    return _service_cost_percentage('Home', 'at Home')
+
+
+@figure('html_cost/days_in_hospital.html', [(EXPENDITURE_WORKBOOK, expenditure.DAYS_IN_HOSPITAL_SHEET)], EXPENDITURE_CODE)
+def days_in_hospital():
+    return px.bar(
+        expenditure.load_days_in_hospital(), x='Mapped Age Group', y='day_in_hospital', color='Gender',
+        title='Day in hospital by Mapped Age Group and Gender',
+        labels={'Mapped Age Group': 'Age Group'}, barmode='group'
+    )
+
+
+@figure('html_cost/average_expenditure_a_day_age_group.html', EXPENDITURE_SHEETS, EXPENDITURE_CODE)
+def average_expenditure_a_day_age_group():
+    aggregated = _unit_costs().groupby(['Age Group', 'Gender'], as_index=False, observed=True).agg(
+        {'Expenditure per Person for a day': 'sum'}
+    )
+    males = aggregated[aggregated['Gender'] == 'Males']
+    females = aggregated[aggregated['Gender'] == 'Females']
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=males['Age Group'], y=males['Expenditure per Person for a day'], name='Males',
+        text=males['Expenditure per Person for a day'], textposition='auto', marker=dict(color='blue'),
+        hovertemplate='%{x}: $%{y:,.2f}<extra></extra>', texttemplate='%{text:,.2f}'
+    ))
+    fig.add_trace(go.Scatter(
+        x=females['Age Group'], y=females['Expenditure per Person for a day'], mode='lines+markers', name='Females',
+        line=dict(width=2, color='red'), marker=dict(size=8, color='red'),
+        hovertemplate='%{x}: $%{y:,.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        title='Expenditure per Person for a Day by Age Group and Gender', xaxis_title='Age Group',
+        yaxis_title='Expenditure per Person for a Day', barmode='group', template='ggplot2'
+    )
+    return fig
+
+
+PROJECTION_SHEETS = [(projection.POPULATION_WORKBOOK, 0), (MACHINE_READABLE_WORKBOOK, 0)]
+PROJECTION_CODE = ['fall.projection', 'fall.plotting', 'fall.age_bands', 'fall.measures', 'fall.table_store', 'fall.ingest']
+
+# Year shown by the predicted slides
+PROJECTION_YEAR = 2032
+
+
+@lru_cache(maxsize=None)
+def _population(granularity=projection.RATE_GRANULARITY):
+    return projection.load_population(granularity=granularity)
+
+
+# Estimated hospitalisations in PROJECTION_YEAR by H2 age group and cause
+def _predicted_cases():
+    population = _population()
+    predicted = projection.project_frame(population, keep=('year', 'age', 'cause'))
+    predicted = predicted[predicted['year'] == PROJECTION_YEAR]
+    return predicted.rename(columns={'age': 'Age Group', 'cause': 'Cause'})
+
+
+@figure('html/predicted_injures_by_age_causes_stacked_bar_chart.html', PROJECTION_SHEETS, PROJECTION_CODE)
+def predicted_injuries_by_age_causes_stacked_bar_chart():
+    fig = plotting.bar(
+        _predicted_cases(), x='Age Group', y='Estimated Number of People', color='Cause',
+        title="Interactive Stacked Bar Chart of Estimated Number of People by Cause and Age Group"
+    )
+    fig.update_layout(barmode='stack', xaxis=dict(categoryorder='array', categoryarray=list(band_labels('H2'))))
+    return fig
+
+
+@figure('html/predicted_injures_by_age_causes_stacked_bar_chart_percentage.html', PROJECTION_SHEETS, PROJECTION_CODE)
+def predicted_injuries_by_age_causes_stacked_bar_chart_percentage():
+    fig = plotting.bar(
+        _predicted_cases(), x='Age Group', y='Estimated Number of People', color='Cause', percent_of='Age Group',
+        labels={'Estimated Number of People': 'Percentage'},
+        title="Interactive Percentage Stacked Bar Chart of Estimated Number of People by Cause and Age Group"
+    )
+    fig.update_layout(
+        barmode='stack', yaxis_title='Percentage of Total (%)',
+        xaxis=dict(categoryorder='array', categoryarray=list(band_labels('H2')))
+    )
+    return fig
+
+
+@figure('html/pyramid_2032.html', [(projection.POPULATION_WORKBOOK, 0)], PROJECTION_CODE)
+def pyramid_2032():
+    population = _population('85+')
+    year = population.labels['year'].index(PROJECTION_YEAR)
+    by_age_and_sex = population.values[year].sum(axis=0)
+    ages = population.labels['age']
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=ages, x=-by_age_and_sex[:, 0], name='Male', orientation='h'))
+    fig.add_trace(go.Bar(y=ages, x=by_age_and_sex[:, 1], name='Female', orientation='h'))
+    fig.update_layout(
+        title=f'Population Pyramid ({PROJECTION_YEAR})', barmode='relative',
+        xaxis=dict(title='Population', tickformat=','),
+        yaxis=dict(title='Age Groups', categoryorder='array', categoryarray=ages),
+        legend=dict(title='Gender')
+    )
+    return fig
+
+
+# Median line inside a shaded band between the outer percentiles
+def _band_traces(x, bands, name, color='rgba(70, 130, 180, 0.25)'):
+    lower, median, upper = (bands[column] for column in bands.columns)
+    return [
+        go.Scatter(x=x, y=upper, mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'),
+        go.Scatter(
+            x=x, y=lower, mode='lines', line=dict(width=0), fill='tonexty', fillcolor=color,
+            name=f'{bands.columns[0]}-{bands.columns[-1]}'
+        ),
+        go.Scatter(x=x, y=median, mode='lines+markers', name=name, hovertemplate='%{x}: $%{y:,.0f}<extra></extra>'),
+    ]
+
+
+@figure('html_cost/projected_fall_cost_bands.html', EXPENDITURE_SHEETS + [(projection.POPULATION_WORKBOOK, 0)],
+        EXPENDITURE_CODE + ['fall.projection', 'fall.simulator', 'fall.uncertainty'])
+def projected_fall_cost_bands():
+    population = _population()
+    result, labels = projection.project(population, keep=('year', 'area', 'age', 'sex', 'cause'))
+    falls = result[..., labels['cause'].index('Falls')]
+    hospital, home = uncertainty.per_case_costs(simulator.UnitCosts(_unit_costs()), projection.RATE_GRANULARITY)
+    bands = uncertainty.projected_cost_bands(falls, labels['year'], hospital, home)
+
+    fig = go.Figure(_band_traces(bands.index, bands, 'Median projected cost'))
+    fig.update_layout(
+        title='Projected Fall Expenditure with 95% Uncertainty Band', xaxis_title='Year',
+        yaxis_title='Expenditure ($)', yaxis_tickformat=',.0f', template='plotly_white'
+    )
+    return fig
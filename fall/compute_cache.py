@@ -0,0 +1,257 @@
+import ast
+import functools
+import hashlib
+import importlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+import pyarrow as pa
+
+from fall.instrumentation import recorder
+
+# Memory tier per process; the disk tier is shared by every process on the host
+MEMORY_BYTES = 256 * 1024 ** 2
+DISK_DIR = os.path.join('.cache', 'compute')
+DISK_BYTES = 2 * 1024 ** 3
+
+
+def _frame_bytes(frame):
+    usage = frame.memory_usage(deep=True, index=True)
+    return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+
+
+# Hash of the source of modules: the code part of a cache key, so results
+# an older version of the code computed are not served after a deploy
+@functools.lru_cache(maxsize=None)
+def code_version(*modules):
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(inspect.getsource(importlib.import_module(name)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Stable key for a computation: function, arguments, the version of the data
+# it reads (e.g. a workbook fingerprint) and the source of the modules that
+# compute it
+def cache_key(name, args=(), kwargs=None, version=None, modules=()):
+    digest = hashlib.sha256()
+    code = code_version(*modules) if modules else None
+    digest.update(repr((name, args, sorted((kwargs or {}).items()), version, code)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Two-tier cache of DataFrames (and Series) shared across sessions and worker
+# processes.
+#
+# Results are written once as Arrow IPC files under disk_dir and read back by
+# memory-mapping them, so numeric columns are zero-copy, read-only views of the
+# page cache that every worker process maps in common. The most recently used
+# frames are also held in memory up to memory_bytes. Callers get a shallow
+# copy: with copy-on-write they can add or change columns without touching the
+# cached data.
+#
+# The lock only guards the bookkeeping: reading, computing and writing a
+# frame happen outside it, so a miss never holds up lookups of other keys.
+# Concurrent misses on one key wait for the first one's result instead of
+# computing it again.
+class ComputeCache:
+    def __init__(self, memory_bytes=MEMORY_BYTES, disk_dir=DISK_DIR, disk_bytes=DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        # Future of each key being loaded or computed
+        self._pending = {}
+        # Bytes in the disk tier, counted on the first write (see _write_disk)
+        self._disk_size = None
+        self._lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+            'memory_evictions': 0, 'disk_evictions': 0,
+        }
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f'{key}.arrow')
+
+    def _remember(self, key, frame):
+        size = _frame_bytes(frame)
+        if size > self.memory_bytes:
+            return
+        self._memory[key] = (frame, size)
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_size -= evicted_size
+            self.stats['memory_evictions'] += 1
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            source = pa.memory_map(path)
+        except FileNotFoundError:
+            return None
+        table = pa.ipc.open_file(source).read_all()
+        frame = table.to_pandas(split_blocks=True)
+        if table.schema.metadata and table.schema.metadata.get(b'series_name') is not None:
+            frame = frame.iloc[:, 0].rename(_series_name(table.schema.metadata[b'series_name']))
+        os.utime(path)
+        return frame
+
+    # Write frame to the disk tier and add it to the running size, trimming
+    # the tier once that exceeds disk_bytes. The size is counted by walking
+    # disk_dir on the first write only; other processes write to the same
+    # folder, so each trim walks it again and resets the count.
+    def _write_disk(self, key, frame):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(frame, pd.Series):
+            name = frame.name
+            table = pa.Table.from_pandas(frame.to_frame(name='__series__'))
+            metadata = dict(table.schema.metadata or {}, series_name=repr(name).encode('utf-8'))
+            table = table.replace_schema_metadata(metadata)
+        else:
+            table = pa.Table.from_pandas(frame)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        size = os.path.getsize(tmp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_size += size - replaced
+            if self._disk_size > self.disk_bytes:
+                self._trim_disk()
+
+    # (last access, size, path) of every file of the disk tier
+    def _disk_entries(self):
+        entries = []
+        for folder, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith('.arrow'):
+                    path = os.path.join(folder, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+        return entries
+
+    # Remove least recently used files until the disk tier fits disk_bytes
+    def _trim_disk(self):
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            self.stats['disk_evictions'] += 1
+        self._disk_size = total
+
+    # Cached result of compute() for key, computing and storing it on a miss
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self._memory[key][0].copy(deep=False)
+            pending = self._pending.get(key)
+            loading = pending is None
+            if loading:
+                pending = self._pending[key] = Future()
+            else:
+                # Served from the result the first miss keeps in memory
+                self.stats['memory_hits'] += 1
+
+        if not loading:
+            return pending.result().copy(deep=False)
+        try:
+            frame = self._load(key, compute)
+        except BaseException as error:
+            pending.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+        pending.set_result(frame)
+        return frame.copy(deep=False)
+
+    # Frame of key from the disk tier, or computed and stored there, then
+    # remembered in memory
+    def _load(self, key, compute):
+        frame = self._read_disk(key)
+        if frame is not None:
+            with self._lock:
+                self.stats['disk_hits'] += 1
+        else:
+            with self._lock:
+                self.stats['misses'] += 1
+            frame = compute()
+            if not isinstance(frame, (pd.DataFrame, pd.Series)):
+                raise TypeError(f'compute cache stores DataFrames and Series, not {type(frame).__name__}')
+            self._write_disk(key, frame)
+            # Serve the memory-mapped copy so every process shares the same pages
+            frame = self._read_disk(key)
+        with self._lock:
+            self._remember(key, frame)
+        return frame
+
+    # Decorator: cache a function returning a frame. version(*args, **kwargs)
+    # gives the data version, e.g. the fingerprint of the workbook it reads;
+    # the function's module (and modules, for code it calls) version the code.
+    def cached(self, version=None, modules=()):
+        def decorate(function):
+            name = f'{function.__module__}.{function.__qualname__}'
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                data_version = version(*args, **kwargs) if version else None
+                key = cache_key(name, args, kwargs, data_version, (function.__module__, *modules))
+                return self.get_or_compute(key, lambda: function(*args, **kwargs))
+            return wrapper
+        return decorate
+
+    # Hit, miss and eviction counts plus the current size of each tier
+    def metrics(self):
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            return dict(
+                self.stats,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_size,
+                hit_ratio=hits / lookups if lookups else 0.0,
+            )
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+
+
+def _series_name(raw):
+    return ast.literal_eval(raw.decode('utf-8'))
+
+
+# The cache every module of this process shares
+@functools.lru_cache(maxsize=None)
+def shared_cache():
+    cache = ComputeCache()
+    recorder().watch_cache('compute', cache)
+    return cache
@@ -0,0 +1,285 @@
+import base64
+import json
+
+import numpy as np
+import plotly.colors
+
+from fall.cube import DIMENSION_COLUMNS, VALUE_COLUMN
+from fall.figures import bundle_name
+from fall.instrumentation import stage
+
+# Height of the frame the linked charts are drawn in
+HEIGHT = 1280
+
+# Colour of each injury type, the same in every chart
+PALETTE = plotly.colors.qualitative.Light24
+
+# JavaScript typed array each NumPy dtype is decoded into
+_ARRAY_TYPES = {
+    np.dtype('uint8'): 'Uint8Array',
+    np.dtype('uint16'): 'Uint16Array',
+    np.dtype('uint32'): 'Uint32Array',
+    np.dtype('float64'): 'Float64Array',
+}
+
+PAGE_TEMPLATE = """<div id="crossfilter" style="font-family:sans-serif;">
+    <div id="controls" style="display:flex;flex-wrap:wrap;gap:12px;align-items:center;margin-bottom:8px;"></div>
+    <div id="summary" style="font-size:14px;margin-bottom:4px;"></div>
+    <div id="by-type" style="height:400px;"></div>
+    <div id="by-age" style="height:420px;"></div>
+    <div id="by-year" style="height:360px;"></div>
+</div>
+<script src="{bundle_url}"></script>
+<script type="application/json" id="crossfilter-data">{bundle_json}</script>
+<script>
+{script}
+</script>
+"""
+
+# Decodes the bundle once, then answers every click by summing the typed
+# arrays in the browser and redrawing with Plotly.react. Each chart applies
+# every filter except the one on its own dimension, and greys out the values
+# that are filtered away, so the selection stays visible where it was made.
+CROSSFILTER_JS = """(function () {
+    var bundle = JSON.parse(document.getElementById('crossfilter-data').textContent);
+
+    function decode(array) {
+        var binary = atob(array.data);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new window[array.type](bytes.buffer);
+    }
+
+    var tables = {};
+    Object.keys(bundle.tables).forEach(function (ref) {
+        var table = bundle.tables[ref];
+        var dims = {};
+        Object.keys(table.dims).forEach(function (dim) {
+            dims[dim] = {labels: table.dims[dim].labels, codes: decode(table.dims[dim].codes)};
+        });
+        tables[ref] = {rows: table.rows, dims: dims, values: decode(table.values)};
+    });
+
+    // Selected labels per dimension; an empty selection keeps everything
+    var selected = {'Injury Type': {}, 'Age Group': {}, 'Sex': {}};
+
+    function isEmpty(selection) {
+        return Object.keys(selection).length === 0;
+    }
+
+    function keeps(dim, label) {
+        return isEmpty(selected[dim]) || selected[dim][label] === true;
+    }
+
+    function toggle(dim, label) {
+        if (selected[dim][label]) {
+            delete selected[dim][label];
+        } else {
+            selected[dim][label] = true;
+        }
+        draw();
+    }
+
+    // Sums of the table's values over groupDims (a flat array, the first
+    // dimension varying slowest), with every filter but the one on except
+    function aggregate(ref, groupDims, except) {
+        var table = tables[ref];
+        var filters = [];
+        Object.keys(selected).forEach(function (dim) {
+            if (dim === except || !table.dims[dim] || isEmpty(selected[dim])) {
+                return;
+            }
+            var labels = table.dims[dim].labels;
+            var allowed = new Uint8Array(labels.length);
+            for (var i = 0; i < labels.length; i++) {
+                allowed[i] = selected[dim][labels[i]] ? 1 : 0;
+            }
+            filters.push([table.dims[dim].codes, allowed]);
+        });
+        var groups = groupDims.map(function (dim) { return table.dims[dim]; });
+        var size = 1;
+        groups.forEach(function (group) { size *= group.labels.length; });
+        var sums = new Float64Array(size);
+        rows: for (var row = 0; row < table.rows; row++) {
+            for (var f = 0; f < filters.length; f++) {
+                if (!filters[f][1][filters[f][0][row]]) {
+                    continue rows;
+                }
+            }
+            var index = 0;
+            for (var g = 0; g < groups.length; g++) {
+                index = index * groups[g].labels.length + groups[g].codes[row];
+            }
+            sums[index] += table.values[row];
+        }
+        return sums;
+    }
+
+    function row(sums, index, width) {
+        return Array.prototype.slice.call(sums, index * width, (index + 1) * width);
+    }
+
+    var config = {responsive: true, displaylogo: false};
+
+    function drawByType() {
+        var types = tables.H1.dims['Injury Type'].labels;
+        var sums = aggregate('H1', ['Injury Type'], 'Injury Type');
+        Plotly.react('by-type', [{
+            type: 'bar', orientation: 'h', y: types, x: Array.from(sums),
+            marker: {color: types.map(function (type) { return keeps('Injury Type', type) ? bundle.colors[type] : '#d3d3d3'; })},
+            hovertemplate: '%{y}: %{x:,.0f}<extra></extra>'
+        }], {
+            title: {text: 'Injury cases by type (click to filter)'},
+            yaxis: {autorange: 'reversed', automargin: true}, xaxis: {title: {text: 'Number of Cases'}},
+            margin: {t: 40, r: 10}
+        }, config);
+    }
+
+    function drawByAge() {
+        var ages = tables.H1.dims['Age Group'].labels;
+        var types = tables.H1.dims['Injury Type'].labels;
+        var sums = aggregate('H1', ['Injury Type', 'Age Group'], 'Age Group');
+        var opacity = ages.map(function (age) { return keeps('Age Group', age) ? 1 : 0.25; });
+        var traces = [];
+        types.forEach(function (type, index) {
+            if (keeps('Injury Type', type)) {
+                traces.push({
+                    type: 'bar', name: type, x: ages, y: row(sums, index, ages.length),
+                    marker: {color: bundle.colors[type], opacity: opacity}
+                });
+            }
+        });
+        Plotly.react('by-age', traces, {
+            title: {text: 'Injury cases by age group and type (click to filter)'}, barmode: 'stack',
+            xaxis: {type: 'category', title: {text: 'Age Group'}}, yaxis: {title: {text: 'Number of Cases'}},
+            margin: {t: 40, r: 10}
+        }, config);
+    }
+
+    function drawByYear() {
+        var years = tables.D2.dims.Year.labels;
+        var types = tables.D2.dims['Injury Type'].labels;
+        var sums = aggregate('D2', ['Injury Type', 'Year'], null);
+        var traces = [];
+        types.forEach(function (type, index) {
+            if (keeps('Injury Type', type)) {
+                traces.push({
+                    type: 'scatter', mode: 'lines+markers', name: type, x: years, y: row(sums, index, years.length),
+                    line: {color: bundle.colors[type]}
+                });
+            }
+        });
+        Plotly.react('by-year', traces, {
+            title: {text: 'Annual injury cases by type (per 100,000 population; not split by age)'},
+            xaxis: {type: 'category', title: {text: 'Year'}}, yaxis: {title: {text: 'Cases per 100,000'}},
+            margin: {t: 40, r: 10}
+        }, config);
+    }
+
+    function drawSummary() {
+        var total = 0;
+        var values = tables.H1.values;
+        for (var i = 0; i < values.length; i++) {
+            total += values[i];
+        }
+        var kept = aggregate('H1', [], null)[0];
+        document.getElementById('summary').textContent =
+            Math.round(kept).toLocaleString() + ' of ' + Math.round(total).toLocaleString() + ' injury cases selected';
+    }
+
+    function draw() {
+        drawControls();
+        drawSummary();
+        drawByType();
+        drawByAge();
+        drawByYear();
+    }
+
+    function drawControls() {
+        var controls = document.getElementById('controls');
+        controls.innerHTML = '';
+        var sexes = [];
+        Object.keys(tables).forEach(function (ref) {
+            tables[ref].dims.Sex.labels.forEach(function (sex) {
+                if (sexes.indexOf(sex) < 0) {
+                    sexes.push(sex);
+                }
+            });
+        });
+        sexes.forEach(function (sex) {
+            var label = document.createElement('label');
+            var box = document.createElement('input');
+            box.type = 'checkbox';
+            box.checked = selected.Sex[sex] === true;
+            box.onchange = function () { toggle('Sex', sex); };
+            label.appendChild(box);
+            label.appendChild(document.createTextNode(' ' + sex));
+            controls.appendChild(label);
+        });
+        var reset = document.createElement('button');
+        reset.textContent = 'Clear filters';
+        reset.onclick = function () {
+            selected = {'Injury Type': {}, 'Age Group': {}, 'Sex': {}};
+            draw();
+        };
+        controls.appendChild(reset);
+    }
+
+    draw();
+    document.getElementById('by-type').on('plotly_click', function (event) {
+        toggle('Injury Type', event.points[0].y);
+    });
+    document.getElementById('by-age').on('plotly_click', function (event) {
+        toggle('Age Group', event.points[0].x);
+    });
+})();
+"""
+
+
+# Typed array as base64 of its little-endian bytes
+def _encode(values):
+    data = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')).tobytes()
+    return {'type': _ARRAY_TYPES[values.dtype], 'data': base64.b64encode(data).decode('ascii')}
+
+
+# Category codes in the smallest unsigned type that holds them
+def _codes(column):
+    return column.cat.codes.to_numpy().astype(np.min_scalar_type(max(len(column.cat.categories) - 1, 0)))
+
+
+# Finest cuboid of each table (one row per combination of all its
+# dimensions), as category labels plus typed-array codes and values, and a
+# colour per injury type. cubes maps a table reference to a cube holding it.
+def bundle(cubes):
+    tables = {}
+    types = []
+    for table_ref, cube in cubes.items():
+        dims = list(DIMENSION_COLUMNS[table_ref])
+        grain = cube.slice(table_ref, dims)
+        tables[table_ref] = {
+            'rows': len(grain),
+            'dims': {
+                dim: {'labels': [str(label) for label in grain[dim].cat.categories], 'codes': _encode(_codes(grain[dim]))}
+                for dim in dims
+            },
+            'values': _encode(grain[VALUE_COLUMN].to_numpy(dtype=np.float64)),
+        }
+        types += [label for label in tables[table_ref]['dims']['Injury Type']['labels'] if label not in types]
+    colors = {label: PALETTE[index % len(PALETTE)] for index, label in enumerate(types)}
+    return {'tables': tables, 'colors': colors}
+
+
+# Page with the linked type, age and yearly charts of the H1 and D2 cubes.
+# The bundle is embedded once; filtering never goes back to the server.
+def crossfilter_page(cubes):
+    from plotly.offline import get_plotlyjs_version
+
+    with stage('serialize'):
+        bundle_json = json.dumps(bundle(cubes), separators=(',', ':')).replace('</', '<\\/')
+        return PAGE_TEMPLATE.format(
+            bundle_url=f'/app/static/{bundle_name(get_plotlyjs_version())}',
+            bundle_json=bundle_json,
+            script=CROSSFILTER_JS,
+        )
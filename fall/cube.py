@@ -0,0 +1,104 @@
+from itertools import combinations
+
+import pandas as pd
+
+from fall.age_bands import harmonize
+from fall.compute_cache import cache_key
+from fall.instrumentation import stage
+
+# Dimensions of the cube, in the order group-by keys are listed
+DIMENSIONS = ['Injury Type', 'Age Group', 'Sex', 'Year']
+
+# Machine-readable column holding each dimension, per table. Dimensions a
+# table does not report are left out and aggregated over.
+DIMENSION_COLUMNS = {
+    'H1': {
+        'Injury Type': 'ReportingCategory2',
+        'Age Group': 'ReportingCategory4',
+        'Sex': 'ReportingCategory1',
+        'Year': 'PeriodFrom',
+    },
+    'D2': {
+        'Injury Type': 'ReportingCategory2',
+        'Sex': 'ReportingCategory1',
+        'Year': 'ReportingCategory4',
+    },
+}
+
+VALUE_COLUMN = 'Number of Cases'
+
+# Age groups are relabelled onto these canonical bands
+AGE_GRANULARITY = '5-year'
+
+# Modules whose code computes the cuboids, part of their cache keys
+CUBOID_MODULES = ('fall.cube', 'fall.age_bands', 'fall.table_store')
+
+
+# Sums and shares for every combination of dimensions, computed once.
+# slice() is a dictionary lookup that returns a frame with one row per
+# combination of the requested dimensions and these value columns:
+#   'Number of Cases'        - the sum
+#   'Percentage'             - share of the table total, in percent
+#   'Percentage of <dim>'    - share within each value of <dim>, in percent
+#
+# With a ComputeCache and the data version of the tables, cuboids are read
+# from the cache shared by every worker process instead of being recomputed.
+class AggregateCube:
+    def __init__(self, tables, cache=None, version=None):
+        self.version = version
+        self._cuboids = {}
+        for table_ref, base in tables.items():
+            dims = [dim for dim in DIMENSIONS if dim in base.columns]
+            total = base[VALUE_COLUMN].sum()
+            for size in range(len(dims) + 1):
+                for group in combinations(dims, size):
+                    def compute(group=group):
+                        return _rollup(base, list(group), total)
+                    if cache is not None:
+                        key = cache_key('fall.cube.cuboid', (table_ref, group), version=version, modules=CUBOID_MODULES)
+                        self._cuboids[(table_ref, group)] = cache.get_or_compute(key, compute)
+                    else:
+                        self._cuboids[(table_ref, group)] = compute()
+
+    # Build from a TableStore, using its rows without totals
+    @classmethod
+    def from_store(cls, store, dimension_columns=DIMENSION_COLUMNS, cache=None, version=None):
+        tables = {}
+        for table_ref, columns in dimension_columns.items():
+            table = store.get_table(table_ref, exclude_totals=True)
+            base = pd.DataFrame({
+                dim: harmonize(table[column], AGE_GRANULARITY) if dim == 'Age Group' else _in_appearance_order(table[column])
+                for dim, column in columns.items()
+            })
+            base[VALUE_COLUMN] = table['MeasureValueNumber'].to_numpy()
+            tables[table_ref] = base
+        return cls(tables, cache, version)
+
+    # Aggregated rows of table_ref grouped by dims (any order, any subset)
+    def slice(self, table_ref, dims=()):
+        with stage('filter'):
+            dims = tuple(dims)
+            key = (table_ref, tuple(dim for dim in DIMENSIONS if dim in dims))
+            if key not in self._cuboids:
+                raise KeyError(f"No cuboid for {table_ref} by {list(dims)}")
+            return self._cuboids[key]
+
+
+# Categorical whose categories follow the order AIHW publishes them in,
+# so causes and years sort naturally rather than alphabetically
+def _in_appearance_order(column):
+    values = column.astype(object)
+    return pd.Categorical(values, categories=pd.unique(values.dropna()), ordered=True)
+
+
+def _rollup(base, group, total):
+    if not group:
+        cuboid = pd.DataFrame({VALUE_COLUMN: [base[VALUE_COLUMN].sum()]})
+    else:
+        cuboid = base.groupby(group, observed=True, as_index=False)[VALUE_COLUMN].sum()
+    cuboid['Percentage'] = cuboid[VALUE_COLUMN] / total * 100
+    if len(group) > 1:
+        for dim in group:
+            within = cuboid.groupby(dim, observed=True)[VALUE_COLUMN].transform('sum')
+            cuboid[f'Percentage of {dim}'] = cuboid[VALUE_COLUMN] / within * 100
+    return cuboid
@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+
+from fall.figures import slide_source
+
+# Height of a figure iframe when neither the slide nor the deck sets one
+DEFAULT_HEIGHT = 600
+
+
+class DeckError(ValueError):
+    pass
+
+
+# A presentation described by a JSON (or YAML) manifest:
+#
+#   title        page and heading title
+#   stylesheet   optional CSS file injected into the page
+#   height       default iframe height; width optional
+#   default_tab  tab selected on first load
+#   tabs         [{"name": ..., "markdown": "file.md"} | {"name": ..., "slides": true}
+#                 | {"name": ...} rendered by a custom_tabs function]
+#   slides       [{"title": ..., "figures": ["html/..."], "markdown": "file.md",
+#                  "height": 800, "width": 1000}]
+#
+# Every referenced file is checked when the deck is loaded, and markdown is
+# read once, so a missing asset fails at boot rather than mid-talk.
+class Deck:
+    def __init__(self, manifest, path='<manifest>'):
+        self.path = path
+        self.title = manifest['title']
+        self.height = manifest.get('height', DEFAULT_HEIGHT)
+        self.width = manifest.get('width')
+        self.tabs = manifest['tabs']
+        self.default_tab = manifest.get('default_tab', self.tabs[0]['name'])
+        self.slides = [self._slide(slide) for slide in manifest['slides']]
+        self.stylesheet = manifest.get('stylesheet')
+
+        # path -> indices of the slides showing it
+        self.asset_index = {}
+        for index, slide in enumerate(self.slides):
+            for figure in slide['figures']:
+                self.asset_index.setdefault(figure, []).append(index)
+
+        self._validate()
+        self._texts = {path: _read_text(path) for path in self._text_files()}
+
+    def _slide(self, slide):
+        return {
+            'title': slide['title'],
+            'figures': list(slide.get('figures', [])),
+            'markdown': slide.get('markdown'),
+            'height': slide.get('height', self.height),
+            'width': slide.get('width', self.width),
+        }
+
+    def _text_files(self):
+        files = [tab['markdown'] for tab in self.tabs if tab.get('markdown')]
+        files += [slide['markdown'] for slide in self.slides if slide['markdown']]
+        if self.stylesheet:
+            files.append(self.stylesheet)
+        return files
+
+    def _validate(self):
+        names = [tab['name'] for tab in self.tabs]
+        if self.default_tab not in names:
+            raise DeckError(f"{self.path}: default_tab {self.default_tab!r} is not one of {names}")
+        if not self.slides:
+            raise DeckError(f"{self.path}: deck has no slides")
+
+        missing = [path for path in self._text_files() if not os.path.exists(path)]
+        missing += [path for path in self.asset_index if not os.path.exists(slide_source(path))]
+        if missing:
+            raise DeckError(f"{self.path}: missing files: {', '.join(missing)}")
+
+    # Contents of a markdown file or the stylesheet, read at load time
+    def text(self, path):
+        return self._texts[path]
+
+    # Figure files of the slides either side of index, for prefetching
+    def neighbour_figures(self, index):
+        neighbours = [i for i in (index - 1, index + 1) if 0 <= i < len(self.slides)]
+        return [figure for i in neighbours for figure in self.slides[i]['figures']]
+
+
+def _read_text(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+# Load a deck manifest; .yaml/.yml files need PyYAML installed
+def load_deck(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            manifest = yaml.safe_load(file)
+        else:
+            manifest = json.load(file)
+    try:
+        return Deck(manifest, path)
+    except KeyError as error:
+        raise DeckError(f"{path}: missing required key {error}") from None
+
+
+# Check deck manifests, e.g. in CI or before starting the apps:
+#   python -m fall.deck decks/population.json decks/expenditure.json
+if __name__ == '__main__':
+    failed = False
+    for deck_path in sys.argv[1:]:
+        try:
+            deck = load_deck(deck_path)
+            print(f'{deck_path}: {len(deck.slides)} slides, {len(deck.asset_index)} figures')
+        except DeckError as error:
+            print(error)
+            failed = True
+    sys.exit(1 if failed else 0)
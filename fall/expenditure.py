@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from fall.age_bands import band_labels, harmonize
+from fall.ingest import read_workbook
+from fall.measures import MACHINE_READABLE_WORKBOOK, case_counts
+
+# AIHW health expenditure summary used by notebook/analysis.ipynb
+EXPENDITURE_WORKBOOK = os.path.join('data', 'summary.xlsx')
+SUMMARY_SHEET = 'Summary'
+DAYS_IN_HOSPITAL_SHEET = 'average_days_in_hospital_19_20'
+
+# Year of expenditure matched against the 2022-23 injury cases
+CASES_YEAR = 2022
+
+HOSPITAL_SERVICES = [
+    'Public hospital outpatient', 'Public hospital emergency department', 'Public hospital admitted patient',
+    'Private hospital services', 'Medical imaging', 'Dental expenditure'
+]
+
+HOME_SERVICES = [
+    'General practitioner services', 'Allied health and other services', 'Pharmaceutical benefits scheme',
+    'Pathology', 'Specialist services'
+]
+
+# Age bands of the expenditure summary, and the broad bands of the
+# days-in-hospital sheet
+AGE_GRANULARITY = '85+'
+BROAD_GRANULARITY = 'broad'
+AGE_GROUP_ORDER = list(band_labels(AGE_GRANULARITY))
+
+
+# Fall rows of the expenditure summary with the columns the analysis uses
+def load_expenditure_summary(path=EXPENDITURE_WORKBOOK):
+    df = read_workbook(path, sheet_name=SUMMARY_SHEET)
+    df = df[df['BoD conditions'] == 'Falls']
+    return df[['Broad area', 'Age groups', 'Areas of expenditure', 'Sex', 'Year',
+               'Total expenditure $ (constant prices)']].copy()
+
+
+NOT_REPORTED = 'Not reported'
+
+# Columns identifying one expenditure stratum after cleaning
+EXPENDITURE_KEYS = ['Year', 'Broad area', 'Areas of expenditure', 'Age groups', 'Sex']
+
+
+# Share of each known value of column within every group of keys, weighted by
+# value. Groups with nothing known fall back to the overall row-count shares.
+def _known_shares(df, column, keys, value):
+    known = df[df[column] != NOT_REPORTED]
+    weights = known.groupby(keys + [column], observed=True, sort=False)[value].sum().rename('share').reset_index()
+    weights['share'] /= weights.groupby(keys, observed=True, sort=False)['share'].transform('sum')
+    weights = weights[weights['share'] > 0]
+
+    fallback = known[column].value_counts(normalize=True).rename('share').rename_axis(column).reset_index()
+    groups = df[keys].drop_duplicates()
+    uncovered = groups.merge(weights[keys].drop_duplicates(), on=keys, how='left', indicator=True)
+    uncovered = uncovered.loc[uncovered['_merge'] == 'left_only', keys]
+    return pd.concat([weights, uncovered.merge(fallback, how='cross')], ignore_index=True)
+
+
+# Give the value of 'Not reported' rows of column to the known values of the
+# same stratum (the other keys), in proportion to what each already has.
+#
+# With seed=None the split is exact: every 'Not reported' amount is divided
+# across the known values, so totals are preserved to rounding. With a seed,
+# each 'Not reported' row goes whole to one known value drawn with those
+# proportions, reproducibly for the seed. Either way the work is a handful of
+# grouped merges, linear in the number of rows. Returns one row per
+# keys + column with value summed.
+def reallocate_not_reported(df, column, keys, value='Total Expenditure', seed=None):
+    df = df[keys + [column, value]]
+    is_missing = df[column] == NOT_REPORTED
+    if not is_missing.any():
+        return df.groupby(keys + [column], as_index=False, observed=True, sort=False)[value].sum()
+
+    shares = _known_shares(df, column, keys, value)
+    missing = df[is_missing].drop(columns=column)
+    if seed is None:
+        missing = missing.groupby(keys, as_index=False, observed=True, sort=False)[value].sum()
+        allocated = missing.merge(shares, on=keys)
+        allocated[value] = allocated[value] * allocated.pop('share')
+    else:
+        # Inverse-CDF draw: the chosen value is the one whose cumulative share
+        # interval holds the row's uniform number
+        missing = missing.assign(_row=np.arange(len(missing)))
+        draws = np.random.default_rng(seed).random(len(missing))
+        candidates = missing.merge(shares, on=keys)
+        upper = candidates.groupby('_row')['share'].cumsum()
+        draw = draws[candidates['_row'].to_numpy()]
+        chosen = (upper - candidates['share'] <= draw) & (draw < upper)
+        # Rounding can leave a draw above the last upper bound; give it the last value
+        last = ~candidates['_row'].duplicated(keep='last')
+        unmatched = ~chosen.groupby(candidates['_row']).transform('any')
+        allocated = candidates[chosen | (last & unmatched)].drop(columns=['share', '_row'])
+
+    known = df[~is_missing]
+    combined = pd.concat([known, allocated[keys + [column, value]]], ignore_index=True)
+    return combined.groupby(keys + [column], as_index=False, observed=True, sort=False)[value].sum()
+
+
+# Spread each year's dental expenditure evenly over that year's dental rows
+def redistribute_dental(df):
+    is_dental = df['Areas of expenditure'] == 'Dental expenditure'
+    dental = df[is_dental & (df['Total Expenditure'] > 0)]
+    yearly_total = dental.groupby('Year')['Total Expenditure'].sum()
+
+    keys = ['Year', 'Broad area', 'Age groups', 'Sex', 'Areas of expenditure']
+    category_count = df[is_dental].groupby(keys)['Total Expenditure'].transform('size')
+    yearly_count = category_count.groupby(df.loc[is_dental, 'Year']).transform('sum')
+
+    df = df.copy()
+    df['Total Expenditure'] = df['Total Expenditure'].astype(float)
+    redistributed = category_count / yearly_count * df.loc[is_dental, 'Year'].map(yearly_total)
+    df.loc[is_dental, 'Total Expenditure'] = redistributed
+    return df
+
+
+# Cleaned fall expenditure by year, broad area, area, age group and sex. Pass
+# a seed to allocate 'Not reported' rows by sampling instead of exact shares.
+def clean_expenditure(df, seed=None):
+    df = df.rename(columns={'Total expenditure $ (constant prices)': 'Total Expenditure'})
+
+    # Keep the first year of ranges such as "2013-14"
+    df['Year'] = pd.to_numeric(df['Year'].astype(str).str.split('-').str[0])
+
+    df = redistribute_dental(df)
+    for column in ('Age groups', 'Sex'):
+        keys = [key for key in EXPENDITURE_KEYS if key != column]
+        df = reallocate_not_reported(df, column, keys, seed=seed)
+    return df.groupby(EXPENDITURE_KEYS, as_index=False, observed=True)['Total Expenditure'].sum()
+
+
+# Fall hospitalisations by age group and gender from table H1
+def fall_cases(path=MACHINE_READABLE_WORKBOOK):
+    falls = case_counts(path).xs('Falls', level='Injury Type').rename('Number of Cases').reset_index()
+    falls['Age Group'] = harmonize(falls['Age Group'], AGE_GRANULARITY)
+    falls = falls.rename(columns={'Sex': 'Gender'})
+    falls['Gender'] = falls['Gender'].astype(str)
+    return falls.groupby(['Age Group', 'Gender'], as_index=False, observed=True)['Number of Cases'].sum()
+
+
+# Average days in hospital by broad age group and gender, in long form
+def load_days_in_hospital(path=EXPENDITURE_WORKBOOK):
+    days = read_workbook(path, sheet_name=DAYS_IN_HOSPITAL_SHEET)
+    days = days.melt(id_vars=['Mapped Age Group'], var_name='Gender', value_name='day_in_hospital')
+    days['Mapped Age Group'] = harmonize(days['Mapped Age Group'], BROAD_GRANULARITY)
+    return days
+
+
+# Expenditure per person and per person per day by age group, gender and area.
+# Age groups on both sides are Categoricals of the same bands, so the merges
+# join on integer codes.
+def unit_costs(expenditure, cases, days_in_hospital, year=CASES_YEAR):
+    df = expenditure[expenditure['Year'] == year]
+    df = df.rename(columns={'Age groups': 'Age Group', 'Sex': 'Gender'})
+    df['Age Group'] = harmonize(df['Age Group'], AGE_GRANULARITY)
+    df = df.groupby(['Age Group', 'Gender', 'Areas of expenditure'], as_index=False, observed=True)['Total Expenditure'].sum()
+
+    df = df.merge(cases, on=['Age Group', 'Gender'], how='left')
+    df['Expenditure per Person'] = df['Total Expenditure'] / df['Number of Cases']
+
+    df['Mapped Age Group'] = harmonize(df['Age Group'], BROAD_GRANULARITY)
+    df = df.merge(days_in_hospital, on=['Mapped Age Group', 'Gender'], how='left')
+    df['Expenditure per Person for a day'] = df['Expenditure per Person'] / df['day_in_hospital']
+    df['category'] = categorize_services(df['Areas of expenditure'])
+    return df
+
+
+def categorize_services(services):
+    return services.map(
+        lambda service: 'Hospital' if service in HOSPITAL_SERVICES else 'Home' if service in HOME_SERVICES else 'Other'
+    )
+
+
+# One row per age group: totals, cases and summed per-person costs
+def summarise_by_age(costs):
+    summary = costs.groupby('Age Group', observed=True).agg({
+        'Expenditure per Person': 'sum',
+        'Expenditure per Person for a day': 'sum',
+        'Total Expenditure': 'sum',
+        'Number of Cases': 'sum',
+        'day_in_hospital': 'mean',
+    })
+    return summary.reset_index()
+
+
+# Expenditure per person with services as rows and age groups as columns
+def service_costs_by_age(costs):
+    table = costs.pivot_table(
+        index='Areas of expenditure', columns='Age Group', values='Expenditure per Person',
+        aggfunc='sum', observed=True
+    ).fillna(0)
+    table.columns = [str(column) for column in table.columns]
+    table = table.rename_axis('services').reset_index()
+    table['category'] = categorize_services(table['services'])
+    return table
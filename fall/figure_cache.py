@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fall.figures import figure_dict, render_figure
+from fall.instrumentation import stage
+
+# Figures kept per process: a handful of tabs for each data release
+MAX_ENTRIES = 256
+
+
+# Page that draws fig with the shared plotly.js bundle (see render_figure)
+def figure_page(fig, config=None):
+    with stage('serialize'):
+        return render_figure(figure_dict(fig, config))
+
+
+# Serialized figure pages shared by every session of a Streamlit process, keyed
+# by (tab, filters, data version). Each figure is built and serialized once,
+# in the background when warmed, so a rerun only looks up a string: no pandas
+# or Plotly work. A lookup while the figure is still being built waits for that
+# build instead of starting another one.
+class FigureCache:
+    def __init__(self, max_entries=MAX_ENTRIES, workers=1):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._builder = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='figure-warm')
+        self.hits = 0
+        self.misses = 0
+
+    # Page for key; build() returns the Plotly figure, or a finished page, on a miss
+    def get(self, key, build):
+        with self._lock:
+            future = self._entries.get(key)
+            if future is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._reserve(key)
+                owner = True
+        if owner:
+            self._build(key, future, build)
+        return future.result()
+
+    # Build the figures of builders ({key: build}) in the background
+    def warm(self, builders):
+        for key, build in builders.items():
+            with self._lock:
+                if key in self._entries:
+                    continue
+                future = self._reserve(key)
+            self._builder.submit(self._build, key, future, build)
+
+    def _reserve(self, key):
+        future = self._entries[key] = Future()
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return future
+
+    def _build(self, key, future, build):
+        try:
+            page = build()
+            future.set_result(page if isinstance(page, str) else figure_page(page))
+        except BaseException as error:
+            # Forget the failure so the next lookup tries again
+            with self._lock:
+                if self._entries.get(key) is future:
+                    del self._entries[key]
+            future.set_exception(error)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
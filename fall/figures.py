@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import shutil
+import sys
+
+# Slide folders exported as figure JSON
+FIGURE_DIRS = ['html', 'html_cost']
+
+# plotly.js bundles are kept once, in app/static
+STATIC_DIRS = [os.path.join('app', 'static')]
+
+# Each Streamlit app serves its own static/ folder at /app/static/. These are
+# the other apps' folders, which serve_bundles() links the bundles into.
+SERVED_DIRS = [os.path.join('app_cost', 'static')]
+
+# The plotly.js release the notebook slides were written with. Figure JSON
+# records the release it targets under 'plotly_version'; files without it use
+# this one. The version is part of the file name, so browsers can cache each
+# bundle for good.
+PLOTLY_VERSION = '2.32.0'
+PLOTLY_BUNDLE = f'plotly-{PLOTLY_VERSION}.min.js'
+
+
+def bundle_name(version=PLOTLY_VERSION):
+    return f'plotly-{version}.min.js'
+
+FIGURE_TEMPLATE = """<div id="figure" style="width:100%;height:100%;"></div>
+<script src="{bundle_url}"></script>
+<script>
+    var figure = {figure_json};
+    Plotly.newPlot("figure", figure.data, figure.layout, figure.config || {{"responsive": true}});
+</script>
+"""
+
+ARGUMENT_SEPARATOR = re.compile(r'[\s,]*')
+
+
+# Path of the figure JSON that replaces a self-contained slide HTML file
+def figure_path(html_path):
+    return os.path.splitext(html_path)[0] + '.json'
+
+
+# Plain JSON form of a Plotly figure, with its config and the plotly.js
+# release it targets
+def figure_dict(fig, config=None):
+    from plotly.offline import get_plotlyjs_version
+
+    figure = json.loads(fig.to_json())
+    figure['config'] = config or {'responsive': True}
+    figure['plotly_version'] = get_plotlyjs_version()
+    return figure
+
+
+# Write a Plotly figure as JSON (use instead of fig.write_html in the notebooks)
+# and make sure the plotly.js bundle it was made for is installed
+def export_figure(fig, path, config=None):
+    figure = figure_dict(fig, config)
+    install_package_bundle()
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(figure, file, separators=(',', ':'))
+
+
+# Recover data, layout and config from the Plotly.newPlot call of an HTML file
+# written by fig.write_html. Returns None when the file holds no figure.
+def extract_figure(html_path):
+    with open(html_path, 'r', encoding='utf-8') as file:
+        html = file.read()
+
+    # Skip the plotly.js bundle itself, which also mentions Plotly.newPlot(
+    env = html.find('window.PLOTLYENV')
+    start = html.find('Plotly.newPlot(', env) if env != -1 else -1
+    if start == -1:
+        return None
+
+    decoder = json.JSONDecoder()
+    position = start + len('Plotly.newPlot(')
+    args = []
+    while len(args) < 4:
+        position = ARGUMENT_SEPARATOR.match(html, position).end()
+        value, position = decoder.raw_decode(html, position)
+        args.append(value)
+
+    _, data, layout, config = args
+    return {'data': data, 'layout': layout, 'config': config}
+
+
+# Copy the plotly.js bundle embedded in an exported HTML file into the static folders
+def install_plotly_bundle(html_path, static_dirs=STATIC_DIRS):
+    with open(html_path, 'r', encoding='utf-8') as file:
+        html = file.read()
+
+    match = re.search(r'<script type="text/javascript">(/\*\*\s*\* plotly\.js v[\d.]+.*?)</script>', html, re.S)
+    if match is None:
+        raise ValueError(f'No plotly.js bundle found in {html_path}')
+
+    first, *others = static_dirs
+    os.makedirs(first, exist_ok=True)
+    with open(os.path.join(first, PLOTLY_BUNDLE), 'w', encoding='utf-8') as file:
+        file.write(match.group(1))
+    for folder in others:
+        os.makedirs(folder, exist_ok=True)
+        shutil.copyfile(os.path.join(first, PLOTLY_BUNDLE), os.path.join(folder, PLOTLY_BUNDLE))
+
+
+# Copy the plotly.js bundle shipped with the installed plotly package, which
+# figures built by export_figure are rendered with
+def install_package_bundle(static_dirs=STATIC_DIRS):
+    from plotly.offline import get_plotlyjs_version
+
+    name = bundle_name(get_plotlyjs_version())
+    source = os.path.join(os.path.dirname(__import__('plotly').__file__), 'package_data', 'plotly.min.js')
+    for folder in static_dirs:
+        target = os.path.join(folder, name)
+        if not os.path.exists(target):
+            os.makedirs(folder, exist_ok=True)
+            shutil.copyfile(source, target)
+
+
+# Make the bundles of static_dirs available in served_dirs, as hard links to
+# the one copy (copies where the file system has none)
+def serve_bundles(static_dirs=STATIC_DIRS, served_dirs=SERVED_DIRS):
+    for folder in static_dirs:
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            if not name.endswith('.js'):
+                continue
+            for served in served_dirs:
+                target = os.path.join(served, name)
+                if os.path.exists(target):
+                    continue
+                os.makedirs(served, exist_ok=True)
+                try:
+                    os.link(os.path.join(folder, name), target)
+                except OSError:
+                    shutil.copyfile(os.path.join(folder, name), target)
+
+
+# Small HTML page that draws a figure with the shared, cached plotly bundle
+def render_figure(figure):
+    figure_json = json.dumps(figure, separators=(',', ':')).replace('</', '<\\/')
+    bundle_url = f"/app/static/{bundle_name(figure.get('plotly_version', PLOTLY_VERSION))}"
+    return FIGURE_TEMPLATE.format(bundle_url=bundle_url, figure_json=figure_json)
+
+
+# File read_slide actually reads: the figure JSON when it has been exported,
+# otherwise the original HTML file (e.g. text-only slides such as the crude
+# rate explanation)
+def slide_source(html_path):
+    json_path = figure_path(html_path)
+    return json_path if os.path.exists(json_path) else html_path
+
+
+# HTML for one slide
+def read_slide(html_path):
+    source = slide_source(html_path)
+    with open(source, 'r', encoding='utf-8') as file:
+        if source != html_path:
+            return render_figure(json.load(file))
+        return file.read()
+
+
+# Convert every exported slide to figure JSON and install the shared bundle:
+#   python -m fall.figures
+def export_slides(figure_dirs=FIGURE_DIRS):
+    exported = []
+    bundle_source = None
+    for folder in figure_dirs:
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.html'):
+                continue
+            html_path = os.path.join(folder, name)
+            figure = extract_figure(html_path)
+            if figure is None:
+                continue
+            with open(figure_path(html_path), 'w', encoding='utf-8') as file:
+                json.dump(figure, file, separators=(',', ':'))
+            exported.append(html_path)
+            bundle_source = bundle_source or html_path
+
+    if bundle_source is not None:
+        install_plotly_bundle(bundle_source)
+    return exported
+
+
+if __name__ == '__main__':
+    for path in export_slides(sys.argv[1:] or FIGURE_DIRS):
+        print(f'Exported {figure_path(path)}')
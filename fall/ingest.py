@@ -0,0 +1,520 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Optional: without it (Windows) conversions only exclude each other within a process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Workbooks under these folders are converted into the columnar cache
+SOURCE_DIRS = ['data', 'csv']
+
+# Parquet copies and their manifests live here, one folder per workbook
+CACHE_DIR = os.path.join('.cache', 'columnar')
+
+# Text columns with at most this share of distinct values are stored as categories
+CATEGORY_RATIO = 0.5
+
+# Sheets are streamed in chunks of this many rows, which bounds the memory a
+# conversion needs whatever the size of the workbook
+CHUNK_ROWS = 20_000
+
+# Distinct values remembered per text column to decide on categories; columns
+# with more are stored as strings
+MAX_TRACKED_VALUES = 1 << 16
+
+# Workbooks at least this large have their sheets converted on a process pool
+PARALLEL_BYTES = 1 << 20
+
+# Cell text pd.read_excel reads as missing
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+
+# Identify a workbook by its modification time, size and content hash
+def file_fingerprint(path):
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest.hexdigest()}
+
+
+# data/ and csv/ share file names, so the parent folder is part of the key
+def _cache_folder(path):
+    parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, parent, stem)
+
+
+def _manifest_path(path):
+    return os.path.join(_cache_folder(path), 'manifest.json')
+
+
+def _sheet_file(sheet_name):
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in sheet_name)
+    return f'{safe_name}.parquet'
+
+
+def _read_manifest(path):
+    try:
+        with open(_manifest_path(path), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+# Name to write path under before renaming it into place, unique to the writer
+def _temporary_path(path):
+    return f'{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+
+
+def _write_manifest(path, manifest):
+    target = _manifest_path(path)
+    temporary = _temporary_path(target)
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary, target)
+
+
+# Lock of each cache folder within this process; the lock file orders processes
+_FOLDER_LOCKS = {}
+_FOLDER_LOCKS_GUARD = threading.Lock()
+
+
+# Hold the conversion lock of a workbook: a lock file in its cache folder, so
+# one thread of one process converts it while the others wait
+@contextmanager
+def _workbook_lock(path):
+    folder = _cache_folder(path)
+    os.makedirs(folder, exist_ok=True)
+    with _FOLDER_LOCKS_GUARD:
+        folder_lock = _FOLDER_LOCKS.setdefault(folder, threading.Lock())
+    with folder_lock, open(os.path.join(folder, '.lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+# Give every column a concrete Arrow type: numbers stay numeric, text becomes
+# string or category depending on how repetitive it is
+def encode_frame(df):
+    df = df.copy()
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            continue
+        series = series.map(lambda value: value if pd.isna(value) else str(value)).astype('string')
+        non_null = series.dropna()
+        if len(non_null) and non_null.nunique() <= CATEGORY_RATIO * len(non_null):
+            series = series.astype('category')
+        df[column] = series
+    return df
+
+
+# True when the cached copy still matches the workbook on disk and every
+# sheet file it lists exists. The mtime is checked first; the hash is only
+# computed when the mtime moved, so touching a file without changing it does
+# not trigger a rebuild.
+def is_fresh(path, manifest=None):
+    manifest = manifest if manifest is not None else _read_manifest(path)
+    if manifest is None:
+        return False
+    folder = _cache_folder(path)
+    if not all(os.path.exists(os.path.join(folder, name)) for name in manifest['sheets'].values()):
+        return False
+    source = manifest['source']
+    stat = os.stat(path)
+    if stat.st_mtime_ns == source['mtime_ns'] and stat.st_size == source['size']:
+        return True
+    fingerprint = file_fingerprint(path)
+    if fingerprint['sha256'] != source['sha256']:
+        return False
+    manifest['source'] = fingerprint
+    _write_manifest(path, manifest)
+    return True
+
+
+# Column names as pd.read_excel gives them: blank headers become
+# "Unnamed: <position>" and repeats get a ".1", ".2" suffix
+def _column_names(header):
+    names, seen = [], {}
+    for position, value in enumerate(header):
+        name = f'Unnamed: {position}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'text'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return 'datetime'
+    return 'text'
+
+
+# One column of a chunk as an Arrow array in the narrowest type that holds it
+def _chunk_array(values, kinds):
+    if kinds <= {'int'}:
+        return pa.array(values, type=pa.int64())
+    if kinds <= {'int', 'float'}:
+        return pa.array(np.array([np.nan if value is None else value for value in values], dtype=float))
+    if kinds == {'datetime'}:
+        return pa.array(values, type=pa.timestamp('us'))
+    return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+# Streams one sheet into Parquet part files of CHUNK_ROWS rows, keeping per
+# column only what the final type depends on: the kinds of value seen, the
+# number of missing cells and (up to MAX_TRACKED_VALUES) the distinct texts.
+# A sheet that fits in one chunk never touches the part files.
+class _SheetWriter:
+    def __init__(self, parts_folder, header):
+        self.parts_folder = parts_folder
+        self.parts = []
+        self._last = None
+        self.names = _column_names(header)
+        self.kinds = [set() for _ in self.names]
+        self.nulls = [0 for _ in self.names]
+        self.distinct = [set() for _ in self.names]
+        self.rows = 0
+        self._chunk = []
+
+    def add(self, row):
+        self._chunk.append(row)
+        if len(self._chunk) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self, last=False):
+        if not self._chunk:
+            return
+        width = max(len(self.names), max(len(row) for row in self._chunk))
+        while len(self.names) < width:
+            self.names.append(f'Unnamed: {len(self.names)}')
+            self.kinds.append(set())
+            self.nulls.append(self.rows)
+            self.distinct.append(set())
+
+        arrays = []
+        for position in range(width):
+            values = [row[position] if position < len(row) else None for row in self._chunk]
+            values = [None if isinstance(value, str) and value in NA_STRINGS else value for value in values]
+            kinds = {_kind(value) for value in values if value is not None}
+            self.kinds[position] |= kinds
+            self.nulls[position] += sum(value is None for value in values)
+            # Numbers count too: the column may turn out to hold text later
+            if self.distinct[position] is not None:
+                self.distinct[position].update(value for value in values if value is not None)
+                if len(self.distinct[position]) > MAX_TRACKED_VALUES:
+                    self.distinct[position] = None
+            arrays.append(_chunk_array(values, kinds))
+
+        table = pa.Table.from_arrays(arrays, names=[str(position) for position in range(width)])
+        if last:
+            self._last = table
+        else:
+            os.makedirs(self.parts_folder, exist_ok=True)
+            path = os.path.join(self.parts_folder, f'part-{len(self.parts):05d}.parquet')
+            pq.write_table(table, path)
+            self.parts.append(path)
+        self.rows += len(self._chunk)
+        self._chunk = []
+
+    # pandas dtype of each column, following encode_frame
+    def dtypes(self):
+        dtypes = []
+        for kinds, nulls, distinct in zip(self.kinds, self.nulls, self.distinct):
+            if kinds <= {'int'} and kinds and not nulls:
+                dtypes.append('int64')
+            elif kinds <= {'int', 'float'}:
+                dtypes.append('float64')
+            elif kinds == {'datetime'}:
+                dtypes.append('datetime64[us]')
+            elif distinct is not None and len(distinct) <= CATEGORY_RATIO * (self.rows - nulls):
+                dtypes.append('category')
+            else:
+                dtypes.append('string')
+        return dtypes
+
+    # Parts in order, each deleted once read, then the last chunk
+    def _tables(self):
+        for part in self.parts:
+            table = pq.read_table(part)
+            os.remove(part)
+            yield table
+        if self._last is not None:
+            yield self._last
+
+    # Cast the parts to the final types and append them to one Parquet file
+    def finish(self, path):
+        self.flush(last=True)
+        # Blank trailing columns are dropped, as pd.read_excel does
+        width = len(self.names)
+        while width and self.names[width - 1].startswith('Unnamed:') and self.nulls[width - 1] == self.rows:
+            width -= 1
+
+        names, dtypes = self.names[:width], self.dtypes()[:width]
+        empty = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in zip(names, dtypes)})
+        schema = pa.Schema.from_pandas(empty, preserve_index=False)
+        types = [pa.dictionary(pa.int32(), pa.string()) if dtype == 'category' else field.type
+                 for field, dtype in zip(schema, dtypes)]
+        schema = pa.schema([pa.field(name, kind) for name, kind in zip(names, types)], metadata=schema.metadata)
+
+        tmp_path = _temporary_path(path)
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for table in self._tables():
+                arrays = []
+                for position, kind in enumerate(types):
+                    column = table.column(str(position)) if str(position) in table.column_names else pa.nulls(len(table))
+                    if pa.types.is_dictionary(kind):
+                        column = column.cast(pa.string()).dictionary_encode().cast(kind)
+                    else:
+                        column = column.cast(kind)
+                    arrays.append(column)
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            if not self.rows:
+                writer.write_table(schema.empty_table())
+        os.replace(tmp_path, path)
+
+
+# openpyxl releases _parsed_rows has been checked against; requirements.txt
+# pins the newest
+PARSER_OPENPYXL_VERSIONS = ('3.1.5',)
+
+
+# Cell values of one sheet, row by row, from a workbook opened in openpyxl's
+# read-only mode; missing rows come back empty.
+#
+# openpyxl's public iter_rows empties each row element once parsed but leaves
+# it in the tree, and keeps the attributes of formatted rows: for the falls
+# supplementary tables, formatted down to row 1,048,576, converting peaks near
+# 700 MB against 130 MB with _parsed_rows. That walk goes through openpyxl's
+# private reader, so it only runs on the releases above; any other release
+# (or one whose internals moved) takes the public path.
+def _sheet_rows(workbook, sheet_name):
+    import openpyxl
+
+    worksheet = workbook[sheet_name]
+    if openpyxl.__version__ in PARSER_OPENPYXL_VERSIONS:
+        try:
+            return _parsed_rows(workbook, worksheet)
+        except (ImportError, AttributeError):
+            pass
+    # Some writers record wrong dimensions; without them rows end at their last cell
+    worksheet.reset_dimensions()
+    return worksheet.iter_rows(values_only=True)
+
+
+# Rows of worksheet parsed by openpyxl's private WorkSheetParser, with the
+# loop our own so each row element is dropped once read. Raises ImportError
+# or AttributeError up front when the internals it uses are missing.
+def _parsed_rows(workbook, worksheet):
+    from openpyxl.worksheet._reader import CELL_TAG, DATA_TAG, ROW_TAG, WorkSheetParser
+
+    parser = WorkSheetParser(
+        None, worksheet._shared_strings, data_only=True, epoch=workbook.epoch,
+        date_formats=workbook._date_formats, timedelta_formats=workbook._timedelta_formats,
+    )
+    source = workbook._archive.open(worksheet._worksheet_path)
+    return _walk_rows(parser, source, (CELL_TAG, DATA_TAG, ROW_TAG))
+
+
+def _walk_rows(parser, source, tags):
+    from xml.etree.ElementTree import iterparse
+
+    cell_tag, data_tag, row_tag = tags
+    with source:
+        sheet_data = None
+        row_number = 0
+        for event, element in iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == data_tag:
+                    sheet_data = element
+                continue
+            if element.tag != row_tag:
+                continue
+
+            number = int(float(element.get('r', row_number + 1)))
+            for _ in range(row_number + 1, number):
+                yield ()
+            row_number = parser.row_counter = number
+            parser.col_counter = 0
+
+            values = []
+            for cell in element.iterfind(cell_tag):
+                parsed = parser.parse_cell(cell)
+                values.extend([None] * (parsed['column'] - 1 - len(values)))
+                values.append(parsed['value'])
+            sheet_data.remove(element)
+            yield tuple(values)
+
+
+# Stream one sheet into folder/file_name, holding one chunk of rows at a time.
+# The part files go to a folder of this writer's own, so writers of the same
+# sheet in other processes or threads never delete each other's parts.
+def _convert_sheet(workbook, sheet_name, folder, file_name):
+    parts_folder = os.path.join(folder, f'.{file_name}.{os.getpid()}.{uuid.uuid4().hex}.parts')
+    try:
+        rows = _sheet_rows(workbook, sheet_name)
+        writer = _SheetWriter(parts_folder, next(rows, None) or ())
+
+        # Blank rows are only written once a later row has data, so
+        # trailing blank rows are dropped as pd.read_excel does
+        blank_rows = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            for _ in range(blank_rows):
+                writer.add(())
+            blank_rows = 0
+            writer.add(row)
+        writer.finish(os.path.join(folder, file_name))
+    finally:
+        shutil.rmtree(parts_folder, ignore_errors=True)
+    return file_name
+
+
+# Convert a group of sheets with the workbook opened once, in openpyxl's
+# read-only mode. Runs in this process or in a worker.
+def _convert_sheets(args):
+    from openpyxl import load_workbook
+
+    path, sheet_names, folder = args
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return [(name, _convert_sheet(workbook, name, folder, _sheet_file(name))) for name in sheet_names]
+    finally:
+        workbook.close()
+
+
+# Parse every sheet of a workbook once and store each as a Parquet file.
+# Sheets are streamed row by row in bounded chunks, so memory does not grow
+# with the workbook. Workbooks of PARALLEL_BYTES or more spread their sheets
+# over a process pool of up to one worker per CPU; workers=1 converts in this
+# process.
+def convert_workbook(path, workers=None):
+    from openpyxl import load_workbook
+
+    folder = _cache_folder(path)
+    os.makedirs(folder, exist_ok=True)
+    fingerprint = file_fingerprint(path)
+
+    workbook = load_workbook(path, read_only=True)
+    sheet_names = workbook.sheetnames
+    workbook.close()
+
+    if workers is None:
+        workers = os.cpu_count() or 1 if fingerprint['size'] >= PARALLEL_BYTES else 1
+    workers = max(1, min(workers, len(sheet_names)))
+    if workers > 1:
+        groups = [(path, sheet_names[start::workers], folder) for start in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            converted = dict(pair for group in pool.map(_convert_sheets, groups) for pair in group)
+    else:
+        converted = dict(_convert_sheets((path, sheet_names, folder)))
+
+    manifest = {'source': fingerprint, 'sheets': {sheet_name: converted[sheet_name] for sheet_name in sheet_names}}
+    _write_manifest(path, manifest)
+    return manifest
+
+
+# Return the manifest of an up-to-date columnar copy, converting if needed.
+# Processes and threads finding the same stale copy convert it once: the
+# others wait for the workbook's lock and reuse the result.
+def ensure_cached(path):
+    manifest = _read_manifest(path)
+    if is_fresh(path, manifest):
+        return manifest
+    with _workbook_lock(path):
+        manifest = _read_manifest(path)
+        if not is_fresh(path, manifest):
+            manifest = convert_workbook(path)
+    return manifest
+
+
+# Drop-in replacement for pd.read_excel backed by the memory-mapped Parquet copy.
+# sheet_name follows pandas: 0 is the first sheet, None returns a dict of all sheets.
+def read_workbook(path, sheet_name=0):
+    manifest = ensure_cached(path)
+    folder = _cache_folder(path)
+    names = list(manifest['sheets'])
+
+    def read_sheet(name):
+        sheet_path = os.path.join(folder, manifest['sheets'][name])
+        return pd.read_parquet(sheet_path, memory_map=True)
+
+    if sheet_name is None:
+        return {name: read_sheet(name) for name in names}
+    if isinstance(sheet_name, int):
+        sheet_name = names[sheet_name]
+    return read_sheet(sheet_name)
+
+
+# Content hash of one sheet's columnar copy, so consumers of a single sheet are
+# not invalidated by edits to the others
+def sheet_fingerprint(path, sheet_name=0):
+    manifest = ensure_cached(path)
+    if isinstance(sheet_name, int):
+        sheet_name = list(manifest['sheets'])[sheet_name]
+    digest = hashlib.sha256()
+    with open(os.path.join(_cache_folder(path), manifest['sheets'][sheet_name]), 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# List the workbooks the cache is built from
+def source_workbooks(source_dirs=SOURCE_DIRS):
+    paths = []
+    for folder in source_dirs:
+        if os.path.isdir(folder):
+            paths.extend(
+                os.path.join(folder, name)
+                for name in sorted(os.listdir(folder))
+                if name.endswith('.xlsx') and not name.startswith('~$')
+            )
+    return paths
+
+
+# Rebuild stale entries for every workbook, e.g. as a deploy step:
+#   python -m fall.ingest
+def build_cache(source_dirs=SOURCE_DIRS):
+    rebuilt = []
+    for path in source_workbooks(source_dirs):
+        if not is_fresh(path):
+            ensure_cached(path)
+            rebuilt.append(path)
+    return rebuilt
+
+
+if __name__ == '__main__':
+    for path in build_cache(sys.argv[1:] or SOURCE_DIRS):
+        print(f'Converted {path}')
@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
+import numpy as np
+
+# Opt in with FALL_INSTRUMENT=1; otherwise every hook is a no-op
+ENV_VARIABLE = 'FALL_INSTRUMENT'
+
+# Timed stages of a rerun, in the order they usually happen; the payload sent
+# to the browser is counted in bytes
+STAGES = ('load', 'filter', 'aggregate', 'figure', 'serialize')
+
+# Reruns kept for the panel and the quantiles of the export
+MAX_RERUNS = 500
+QUANTILES = (0.5, 0.9, 0.99)
+
+METRICS_DIR = os.path.join('.cache', 'metrics')
+
+
+class _Stage:
+    def __init__(self, recorder, name):
+        self._recorder = recorder
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._recorder.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+# Stage timings per rerun, payload bytes and cache hit/miss counts of one
+# process. A rerun is tracked per script thread between begin_rerun and
+# end_rerun; work done outside a rerun (e.g. figures warmed in the background)
+# only counts towards the totals.
+class Recorder:
+    def __init__(self, enabled=False, max_reruns=MAX_RERUNS):
+        self.enabled = enabled
+        self.reruns = deque(maxlen=max_reruns)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._caches = {}
+
+    def begin_rerun(self, page):
+        if not self.enabled:
+            return
+        self.end_rerun()
+        self._local.rerun = {'page': page, 'started': time.time(), 'start': time.perf_counter(), 'stages': {}, 'payload_bytes': 0}
+
+    def end_rerun(self):
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is None:
+            return
+        self._local.rerun = None
+        rerun['seconds'] = time.perf_counter() - rerun.pop('start')
+        with self._lock:
+            self.reruns.append(rerun)
+
+    # Time the block as a rerun of page, ending the rerun however the block
+    # exits (st.rerun() and st.stop() raise)
+    @contextmanager
+    def rerun(self, page):
+        self.begin_rerun(page)
+        try:
+            yield self
+        finally:
+            self.end_rerun()
+
+    def stage(self, name):
+        return _Stage(self, name) if self.enabled else nullcontext()
+
+    def add_time(self, name, seconds, page=None):
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            rerun['stages'][name] = rerun['stages'].get(name, 0.0) + seconds
+            page = rerun['page']
+        with self._lock:
+            total = self._totals.setdefault((page or 'background', name), [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+    # Bytes of HTML or JSON sent to the browser
+    def add_payload(self, size):
+        if not self.enabled:
+            return
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is not None:
+            rerun['payload_bytes'] += size
+
+    # Report the hits and misses of cache: anything with hits/misses
+    # attributes, or a ComputeCache (memory and disk hits both count)
+    def watch_cache(self, name, cache):
+        self._caches[name] = cache
+
+    def cache_counts(self):
+        counts = {}
+        for name, cache in self._caches.items():
+            if hasattr(cache, 'metrics'):
+                metrics = cache.metrics()
+                counts[name] = {'hits': metrics['memory_hits'] + metrics['disk_hits'], 'misses': metrics['misses']}
+            else:
+                counts[name] = {'hits': cache.hits, 'misses': cache.misses}
+        return counts
+
+    # Most recent finished rerun of page
+    def last_rerun(self, page):
+        with self._lock:
+            return next((rerun for rerun in reversed(self.reruns) if rerun['page'] == page), None)
+
+    # Quantiles of recent reruns per page, with the count and sum of the same
+    # reruns, plus the lifetime totals per (page, stage) of every timed call
+    def summary(self):
+        with self._lock:
+            reruns = list(self.reruns)
+            totals = {key: list(value) for key, value in self._totals.items()}
+
+        pages = {}
+        for rerun in reruns:
+            page = pages.setdefault(rerun['page'], {'reruns': 0, 'seconds': [], 'payload_bytes': [], 'stages': {}})
+            page['reruns'] += 1
+            page['seconds'].append(rerun['seconds'])
+            page['payload_bytes'].append(rerun['payload_bytes'])
+            for name, seconds in rerun['stages'].items():
+                page['stages'].setdefault(name, []).append(seconds)
+
+        def quantiles(values):
+            return {str(q): float(v) for q, v in zip(QUANTILES, np.quantile(values, QUANTILES))} if values else {}
+
+        return {
+            'pages': {
+                name: {
+                    'reruns': page['reruns'],
+                    'seconds': quantiles(page['seconds']),
+                    'payload_bytes': quantiles(page['payload_bytes']),
+                    'stages': {stage: quantiles(values) for stage, values in page['stages'].items()},
+                    'sums': {
+                        'seconds': float(sum(page['seconds'])),
+                        'payload_bytes': int(sum(page['payload_bytes'])),
+                        'stages': {
+                            stage: {'count': len(values), 'seconds': float(sum(values))}
+                            for stage, values in page['stages'].items()
+                        },
+                    },
+                }
+                for name, page in pages.items()
+            },
+            'totals': [
+                {'page': page, 'stage': stage, 'count': count, 'seconds': seconds}
+                for (page, stage), (count, seconds) in sorted(totals.items())
+            ],
+            'caches': self.cache_counts(),
+        }
+
+    def to_json(self):
+        with self._lock:
+            reruns = list(self.reruns)
+        return json.dumps(dict(self.summary(), reruns=reruns), indent=2)
+
+    # Prometheus text exposition format. Each summary's quantiles, _sum and
+    # _count describe the same recent reruns (stage times summed per rerun);
+    # lifetime totals of every timed call, background work included, are
+    # separate counters.
+    def to_prometheus(self):
+        summary = self.summary()
+        lines = [
+            '# HELP fall_stage_seconds Time spent in each stage per rerun, over recent reruns.',
+            '# TYPE fall_stage_seconds summary',
+        ]
+        for page, info in summary['pages'].items():
+            for stage, values in info['stages'].items():
+                labels = f'page="{page}",stage="{stage}"'
+                for q, value in values.items():
+                    lines.append(f'fall_stage_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+                sums = info['sums']['stages'][stage]
+                lines.append(f'fall_stage_seconds_sum{{{labels}}} {sums["seconds"]:.6f}')
+                lines.append(f'fall_stage_seconds_count{{{labels}}} {sums["count"]}')
+
+        lines += ['# HELP fall_rerun_seconds Wall time of a rerun, over recent reruns.', '# TYPE fall_rerun_seconds summary']
+        for page, info in summary['pages'].items():
+            for q, value in info['seconds'].items():
+                lines.append(f'fall_rerun_seconds{{page="{page}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'fall_rerun_seconds_sum{{page="{page}"}} {info["sums"]["seconds"]:.6f}')
+            lines.append(f'fall_rerun_seconds_count{{page="{page}"}} {info["reruns"]}')
+
+        lines += [
+            '# HELP fall_payload_bytes Bytes sent to the browser per rerun, over recent reruns.',
+            '# TYPE fall_payload_bytes summary',
+        ]
+        for page, info in summary['pages'].items():
+            for q, value in info['payload_bytes'].items():
+                lines.append(f'fall_payload_bytes{{page="{page}",quantile="{q}"}} {value:.0f}')
+            lines.append(f'fall_payload_bytes_sum{{page="{page}"}} {info["sums"]["payload_bytes"]}')
+            lines.append(f'fall_payload_bytes_count{{page="{page}"}} {info["reruns"]}')
+
+        lines += [
+            '# HELP fall_stage_calls_total Timed calls of each stage since the process started.',
+            '# TYPE fall_stage_calls_total counter',
+        ]
+        for total in summary['totals']:
+            lines.append(f'fall_stage_calls_total{{page="{total["page"]}",stage="{total["stage"]}"}} {total["count"]}')
+        lines += [
+            '# HELP fall_stage_time_seconds_total Time in each stage since the process started.',
+            '# TYPE fall_stage_time_seconds_total counter',
+        ]
+        for total in summary['totals']:
+            lines.append(f'fall_stage_time_seconds_total{{page="{total["page"]}",stage="{total["stage"]}"}} {total["seconds"]:.6f}')
+
+        lines += ['# HELP fall_cache_requests_total Cache lookups by result.', '# TYPE fall_cache_requests_total counter']
+        for name, counts in summary['caches'].items():
+            lines.append(f'fall_cache_requests_total{{cache="{name}",result="hit"}} {counts["hits"]}')
+            lines.append(f'fall_cache_requests_total{{cache="{name}",result="miss"}} {counts["misses"]}')
+        return '\n'.join(lines) + '\n'
+
+    # Write a snapshot to path: Prometheus text for .prom/.txt, JSON otherwise
+    def export(self, path):
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+        return path
+
+
+# The recorder every module of this process shares
+@lru_cache(maxsize=None)
+def recorder():
+    return Recorder(enabled=os.environ.get(ENV_VARIABLE) == '1')
+
+
+def stage(name):
+    return recorder().stage(name)
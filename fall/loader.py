@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fall.compute_cache import shared_cache
+from fall.cube import DIMENSION_COLUMNS, AggregateCube
+from fall.expenditure import EXPENDITURE_WORKBOOK
+from fall.ingest import sheet_fingerprint
+from fall.rates import implied_population
+from fall.registry import DatasetRegistry
+
+# Datasets boot() can start loading
+GROUPS = ('injury', 'expenditure')
+
+# Port of the readiness endpoint when boot() is not given one (unset: no endpoint)
+READY_PORT_VARIABLE = 'FALL_READY_PORT'
+
+# Threads loading datasets. Parsing and aggregation mostly hold the GIL, so
+# more threads only interleave the tables rather than finishing them sooner.
+WORKERS = 1
+
+
+# Loads datasets in background threads. Each task has a name (submitting a
+# name twice runs it once) and is pending, ready or failed; pages ask for the
+# tasks they need and draw a placeholder until those are ready.
+class BackgroundLoader:
+    def __init__(self, workers=WORKERS):
+        self.registry = DatasetRegistry()
+        self.started = time.time()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fall-loader')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, function, *args):
+        with self._lock:
+            if name not in self._futures:
+                self._futures[name] = self._pool.submit(function, *args)
+            return self._futures[name]
+
+    def ready(self, name):
+        future = self._futures.get(name)
+        return future is not None and future.done() and future.exception() is None
+
+    # Exception a finished task raised, or None
+    def error(self, name):
+        future = self._futures.get(name)
+        return future.exception() if future is not None and future.done() else None
+
+    # Result of a task, waiting for it if it is still loading
+    def result(self, name, timeout=None):
+        return self._futures[name].result(timeout)
+
+    # (finished, submitted) tasks among names (default: all)
+    def progress(self, names=None):
+        futures = [self._futures[name] for name in (names or list(self._futures)) if name in self._futures]
+        return sum(future.done() for future in futures), len(futures)
+
+    # Whether every task loaded, and the state of each
+    def status(self):
+        tasks = {}
+        for name, future in list(self._futures.items()):
+            if not future.done():
+                tasks[name] = 'loading'
+            elif future.exception() is not None:
+                tasks[name] = f'failed: {future.exception()}'
+            else:
+                tasks[name] = 'ready'
+        return {
+            'ready': all(state == 'ready' for state in tasks.values()),
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'tasks': tasks,
+        }
+
+
+# Name of the task building the aggregate cube of one table of a release
+def cube_task(path, table_ref):
+    return f'cube:{table_ref}:{path}'
+
+
+# Name of the task deriving the population of a release (for rates)
+def population_task(path):
+    return f'population:{path}'
+
+
+UNIT_COSTS_TASK = 'unit_costs'
+
+
+# Cube of one table: splitting the workbook is shared by the tables of a
+# release, and cuboids come from the compute cache when another process
+# already built them
+def _load_cube(registry, path, table_ref):
+    version = sheet_fingerprint(path)
+    store = registry.table_store(path)
+    return AggregateCube.from_store(store, {table_ref: DIMENSION_COLUMNS[table_ref]}, cache=shared_cache(), version=version)
+
+
+def _load_unit_costs():
+    # Imported here: the injury app does not need the simulator
+    from fall.simulator import UnitCosts
+    return UnitCosts.load()
+
+
+# The loader shared by every session of the process
+@lru_cache(maxsize=None)
+def shared_loader():
+    return BackgroundLoader()
+
+
+# Start loading the datasets of groups (newest release first, since pages
+# open on it) and, with a port, serve readiness on it. Returns at once;
+# calling it again only submits what is not loading yet.
+def boot(groups=GROUPS, port=None):
+    loader = shared_loader()
+    if 'injury' in groups:
+        for workbook in loader.registry.releases('Machine_readable'):
+            for table_ref in DIMENSION_COLUMNS:
+                loader.submit(cube_task(workbook['path'], table_ref), _load_cube, loader.registry, workbook['path'], table_ref)
+            loader.submit(population_task(workbook['path']), implied_population, workbook['path'])
+    if 'expenditure' in groups and os.path.exists(EXPENDITURE_WORKBOOK):
+        loader.submit(UNIT_COSTS_TASK, _load_unit_costs)
+    port = port or os.environ.get(READY_PORT_VARIABLE)
+    if port:
+        readiness_server(int(port))
+    return loader
+
+
+# Health endpoint for the load balancer, on a daemon thread:
+#   GET /ready    200 once every submitted task loaded, 503 before (and if one failed)
+#   GET /status   200 with the same JSON body
+@lru_cache(maxsize=None)
+def readiness_server(port, host='0.0.0.0'):
+    loader = shared_loader()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0].rstrip('/')
+            if path not in ('/ready', '/status'):
+                self.send_error(404)
+                return
+            status = loader.status()
+            body = json.dumps(status).encode('utf-8')
+            self.send_response(200 if status['ready'] or path == '/status' else 503)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as error:
+        warnings.warn(f"Readiness endpoint not started on port {port}: {error}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fall-readiness', daemon=True).start()
+    return server
+
+
+#   python -m fall.loader app/app.py --ready-port 8601 -- --server.port 8501
+# Starts loading before Streamlit serves the script, so a worker warms up
+# without waiting for its first visitor; options after the script go to
+# `streamlit run`.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Start loading data, then run a Streamlit app.')
+    parser.add_argument('script')
+    parser.add_argument('--groups', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--ready-port', type=int, help=f'readiness endpoint port (default: ${READY_PORT_VARIABLE})')
+    args, streamlit_args = parser.parse_known_args()
+
+    # The app imports fall.loader, not __main__: boot the instance it will share
+    from fall import loader
+    loader.boot(tuple(args.groups), args.ready_port)
+
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', args.script, *[arg for arg in streamlit_args if arg != '--']]
+    sys.exit(cli.main())
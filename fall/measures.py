@@ -0,0 +1,69 @@
+import os
+
+import pandas as pd
+
+from fall.age_bands import canonical_labels
+from fall.compute_cache import cache_key, shared_cache
+from fall.ingest import sheet_fingerprint
+from fall.table_store import TableStore
+
+MACHINE_READABLE_WORKBOOK = os.path.join('data', 'AIHW_INJCAT213_Machine_readable_21062024.xlsx')
+
+# Levels of every measure table, outermost first
+INDEX_LEVELS = ['Age Group', 'Sex', 'Injury Type']
+
+# Output column for each MeasureName of the tables used here
+MEASURE_COLUMNS = {
+    'Hospitalisations': 'Hospitalisations',
+    'Hospitalisations per 100,000 population': 'Crude Rate',
+}
+
+
+# One row per age group, sex and cause with a column per measure. Levels are
+# categoricals in the order the table lists them.
+def measure_table(store, table_ref):
+    table = store.get_table(table_ref, exclude_totals=True)
+    long = pd.DataFrame({
+        'Age Group': canonical_labels(table['ReportingCategory4']),
+        'Sex': table['ReportingCategory1'].astype(str),
+        'Injury Type': table['ReportingCategory2'].astype(str),
+        'Measure': table['MeasureName'].astype(str).map(MEASURE_COLUMNS),
+        'Value': table['MeasureValueNumber'].to_numpy(),
+    })
+    for level in INDEX_LEVELS:
+        long[level] = pd.Categorical(long[level], categories=long[level].unique())
+    wide = long.pivot_table(index=INDEX_LEVELS, columns='Measure', values='Value', aggfunc='sum', observed=True)
+    wide.columns.name = None
+    return wide
+
+
+# Modules whose code builds the measure tables, part of their cache keys
+MEASURE_MODULES = ('fall.measures', 'fall.age_bands', 'fall.table_store')
+
+
+# measure_table through the shared compute cache, keyed on the sheet's hash
+# and the code that builds it
+def load_measure_table(table_ref, path=MACHINE_READABLE_WORKBOOK):
+    key = cache_key(
+        'fall.measures.measure_table', (table_ref, path), version=sheet_fingerprint(path), modules=MEASURE_MODULES
+    )
+    return shared_cache().get_or_compute(key, lambda: measure_table(TableStore.from_workbook(path), table_ref))
+
+
+# H2: crude rate per 100,000 by the broad age groups of the table
+def crude_rates(path=MACHINE_READABLE_WORKBOOK):
+    return load_measure_table('H2', path)['Crude Rate']
+
+
+# H1: hospitalisations by 5-year age group
+def case_counts(path=MACHINE_READABLE_WORKBOOK):
+    return load_measure_table('H1', path)['Hospitalisations']
+
+
+# Values of a measure for each row of keys (a frame with some or all of
+# INDEX_LEVELS). Missing combinations come back as NaN.
+def lookup(measure, keys):
+    levels = [level for level in INDEX_LEVELS if level in keys.columns]
+    if len(levels) < len(INDEX_LEVELS):
+        measure = measure.groupby(level=levels, observed=True).sum()
+    return measure.reindex(pd.MultiIndex.from_frame(keys[levels])).to_numpy()
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from fall.instrumentation import stage
+
+# Most points one trace carries, and most traces (colours) one figure carries.
+# Beyond them the data is binned or folded, so the payload sent to the browser
+# grows with the number of categories shown, never with the source rows.
+MAX_POINTS = 200
+MAX_TRACES = 20
+
+OTHER = 'Other'
+
+
+def _is_ordered(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.ordered
+    return pd.api.types.is_numeric_dtype(column)
+
+
+# Rows of frame aggregated to one per (x, color): the grain the chart draws
+def to_grain(frame, x, y, color=None, agg='sum'):
+    keys = [x] if color is None else [x, color]
+    return frame.groupby(keys, observed=True, as_index=False)[y].agg(agg)
+
+
+# Keep the keep - 1 largest values of column by total y and fold the rest into OTHER
+def _fold(frame, column, y, keep):
+    totals = frame.groupby(column, observed=True)[y].sum()
+    if len(totals) <= keep:
+        return frame
+    labels = frame[column]
+    if isinstance(labels.dtype, pd.CategoricalDtype) and OTHER not in labels.cat.categories:
+        labels = labels.cat.add_categories([OTHER])
+    top = totals.nlargest(keep - 1).index
+    return frame.assign(**{column: labels.where(labels.isin(top), OTHER)})
+
+
+# Merge consecutive values of an ordered column into at most keep bins:
+# numbers become the bin centre, ordered categories a "first–last" label
+def _bin(frame, column, keep):
+    values = frame[column]
+    if pd.api.types.is_numeric_dtype(values):
+        if values.nunique() <= keep:
+            return frame
+        edges = np.linspace(values.min(), values.max(), keep + 1)
+        codes = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, keep - 1)
+        centres = (edges[:-1] + edges[1:]) / 2
+        return frame.assign(**{column: centres[codes]})
+
+    observed = [category for category in values.cat.categories if category in set(values)]
+    if len(observed) <= keep:
+        return frame
+    size = -(-len(observed) // keep)
+    chunks = [observed[start:start + size] for start in range(0, len(observed), size)]
+    labels = [chunk[0] if len(chunk) == 1 else f'{chunk[0]}–{chunk[-1]}' for chunk in chunks]
+    mapping = {category: label for chunk, label in zip(chunks, labels) for category in chunk}
+    binned = pd.Categorical(values.map(mapping).astype(object), categories=labels, ordered=True)
+    return frame.assign(**{column: binned})
+
+
+# frame reduced to what the chart draws: one row per (x, color), at most
+# max_points per trace and max_traces traces. y is aggregated with agg, so
+# pass additive measures (counts, costs) with 'sum' and ask for shares with
+# percent_of, which are computed after the reduction. Ordered x axes (numbers,
+# years, age groups) are binned; other categories keep the largest and fold
+# the rest into "Other".
+def reduce(frame, x, y, color=None, agg='sum', percent_of=None, max_points=MAX_POINTS, max_traces=MAX_TRACES):
+    with stage('aggregate'):
+        return _reduce(frame, x, y, color, agg, percent_of, max_points, max_traces)
+
+
+def _reduce(frame, x, y, color, agg, percent_of, max_points, max_traces):
+    reduced = to_grain(frame, x, y, color, agg)
+    if _is_ordered(reduced[x]):
+        reduced = _bin(reduced, x, max_points)
+    else:
+        reduced = _fold(reduced, x, y, max_points)
+    if color is not None:
+        reduced = _fold(reduced, color, y, max_traces)
+    reduced = to_grain(reduced, x, y, color, agg)
+
+    if percent_of is not None:
+        within = reduced.groupby(percent_of, observed=True)[y].transform('sum')
+        reduced[y] = reduced[y] / within * 100
+    return reduced
+
+
+# Plotly Express charts drawn from the reduced frame
+def bar(frame, x, y, color=None, agg='sum', percent_of=None, max_points=MAX_POINTS, max_traces=MAX_TRACES, **kwargs):
+    reduced = reduce(frame, x, y, color, agg, percent_of, max_points, max_traces)
+    with stage('figure'):
+        return px.bar(reduced, x=x, y=y, color=color, **kwargs)
+
+
+def line(frame, x, y, color=None, agg='sum', max_points=MAX_POINTS, max_traces=MAX_TRACES, **kwargs):
+    reduced = reduce(frame, x, y, color, agg, None, max_points, max_traces)
+    with stage('figure'):
+        return px.line(reduced, x=x, y=y, color=color, **kwargs)
+
+
+def area(frame, x, y, color=None, agg='sum', max_points=MAX_POINTS, max_traces=MAX_TRACES, **kwargs):
+    reduced = reduce(frame, x, y, color, agg, None, max_points, max_traces)
+    with stage('figure'):
+        return px.area(reduced, x=x, y=y, color=color, **kwargs)
+
+
+def pie(frame, names, values, max_slices=MAX_TRACES, **kwargs):
+    with stage('aggregate'):
+        reduced = to_grain(_fold(to_grain(frame, names, values), names, values, max_slices), names, values)
+    with stage('figure'):
+        return px.pie(reduced, names=names, values=values, **kwargs)
@@ -0,0 +1,174 @@
+import os
+from functools import partial
+
+import streamlit as st
+
+from fall.admin import admin_panel
+from fall.artifacts import PORT_VARIABLE, URL_VARIABLE, artifact_server, shared_store
+from fall.deck import DeckError, load_deck
+from fall.figures import serve_bundles
+from fall.instrumentation import recorder, stage
+from fall.slide_cache import SlideCache
+
+
+# Load and validate a deck once per process (no spinner: nothing may be drawn
+# before st.set_page_config)
+@st.cache_resource(show_spinner=False)
+def get_deck(deck_path):
+    return load_deck(deck_path)
+
+
+# Slide HTML cache shared by every viewer of this process. Slides are read
+# from the compressed artifact store, packed from html/ and html_cost/ at
+# startup, and load plotly.js from the one copy in app/static (linked into
+# this app's static folder). With $FALL_ARTIFACT_PORT set, the store's
+# objects are also served on that port with ETag and long-lived
+# Cache-Control headers, and slides become stubs that fetch their figure and
+# plotly.js from it.
+@st.cache_resource
+def get_slide_cache():
+    serve_bundles()
+    store = shared_store()
+    store.pack()
+    port = os.environ.get(PORT_VARIABLE)
+    server = artifact_server(int(port)) if port else None
+    base_url = os.environ.get(URL_VARIABLE)
+    if server is None and base_url is None:
+        cache = SlideCache(loader=store.slide_page, stamp=store.resolve)
+    else:
+        cache = SlideCache(loader=partial(store.slide_page, base_url=base_url, port=port), stamp=store.resolve)
+    recorder().watch_cache('slides', cache)
+    return cache
+
+
+# Run a deck manifest as a Streamlit presentation. custom_tabs maps a tab
+# name from the manifest to a function that renders it, for tabs that need
+# Python rather than markdown. Reruns are timed under the deck's file name.
+def run_presentation(deck_path, custom_tabs=None):
+    page = os.path.splitext(os.path.basename(deck_path))[0]
+    with recorder().rerun(page):
+        _run_presentation(deck_path, custom_tabs)
+    admin_panel(page)
+
+
+def _run_presentation(deck_path, custom_tabs):
+    custom_tabs = custom_tabs or {}
+    try:
+        deck = get_deck(deck_path)
+    except DeckError as error:
+        st.set_page_config(page_title="Presentation", layout="wide")
+        st.error(str(error))
+        st.stop()
+
+    # Set page configuration (must be the first Streamlit command)
+    st.set_page_config(page_title=deck.title, layout="wide")
+
+    # Inject custom CSS for responsive layout and better positioning
+    if deck.stylesheet:
+        st.markdown(f"<style>\n{deck.text(deck.stylesheet)}\n</style>", unsafe_allow_html=True)
+
+    # Title for the presentation
+    st.title(deck.title)
+
+    # Sidebar navigation
+    tabs = [tab['name'] for tab in deck.tabs]
+    selected_tab = st.sidebar.radio("Select a Tab", tabs, index=tabs.index(deck.default_tab))
+    tab = deck.tabs[tabs.index(selected_tab)]
+
+    if tab.get('slides'):
+        render_slides(deck)
+    elif tab['name'] in custom_tabs:
+        custom_tabs[tab['name']]()
+    elif tab.get('markdown'):
+        st.markdown(deck.text(tab['markdown']))
+
+
+def render_slides(deck):
+    slides = deck.slides
+    slide_cache = get_slide_cache()
+
+    # Initialize session state for the current slide
+    if 'current_slide' not in st.session_state:
+        st.session_state.current_slide = 0
+
+    # Get the current slide index
+    current_slide = min(st.session_state.current_slide, len(slides) - 1)
+    slide = slides[current_slide]
+
+    # Progress bar
+    st.markdown(f"#### Slide {current_slide + 1} of {len(slides)}: {slide['title']}")
+    progress_percentage = ((current_slide + 1) / len(slides)) * 100
+    st.markdown(
+        f"""
+        <div class="progress-bar">
+            <div class="progress-bar-fill" style="width: {progress_percentage}%;"></div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    # Create columns for navigation buttons
+    col1, col2, col3 = st.columns([1, 5, 1])
+
+    # Navigation logic
+    with col1:
+        if st.button("⬅️ Previous", key="prev", disabled=current_slide == 0):
+            st.session_state.current_slide = current_slide - 1
+            st.rerun()
+
+    with col3:
+        if st.button("Next ➡️", key="next", disabled=current_slide == len(slides) - 1):
+            st.session_state.current_slide = current_slide + 1
+            st.rerun()
+
+    # Markdown annotation shown above the figures
+    if slide['markdown']:
+        st.markdown(deck.text(slide['markdown']))
+
+    # Render every figure of the slide, one iframe each
+    for html_filename in slide['figures']:
+        try:
+            with stage('load'):
+                html_content = slide_cache.get(html_filename)
+        except FileNotFoundError:
+            st.error(f"File not found: {html_filename}")
+            continue
+        recorder().add_payload(len(html_content))
+        st.iframe(html_content, height=slide['height'], width=slide['width'] or 'stretch')
+
+    # Warm the cache with the previous and next slides
+    slide_cache.prefetch(deck.neighbour_figures(current_slide))
+
+    # Dropdown for direct navigation to a specific slide
+    st.sidebar.markdown("### Go to Slide")
+    slide_index = st.sidebar.selectbox(
+        "Select Slide",
+        options=range(len(slides)),
+        format_func=lambda x: f"{x + 1}: {slides[x]['title']}",
+        index=current_slide,
+    )
+    if slide_index != current_slide:
+        st.session_state.current_slide = slide_index
+        st.rerun()
+
+
+# Placeholder for content built from background-loaded tasks: a progress
+# bar that polls the loader and reruns the page once they are ready.
+# Returns True when they already are (draw the content), False otherwise.
+def wait_for(loader, names, message="Loading data..."):
+    if all(loader.ready(name) for name in names):
+        return True
+    for name in names:
+        if loader.error(name) is not None:
+            st.error(f"Could not load the data: {loader.error(name)}")
+            return False
+
+    @st.fragment(run_every=0.5)
+    def progress():
+        if all(loader.ready(name) or loader.error(name) is not None for name in names):
+            st.rerun()
+        done, total = loader.progress()
+        st.progress(done / max(total, 1), text=f"{message} ({done} of {total} tables ready)")
+
+    progress()
+    return False
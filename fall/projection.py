@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from fall.age_bands import band_labels, harmonize
+from fall.ingest import read_workbook
+from fall.measures import MACHINE_READABLE_WORKBOOK, crude_rates
+
+# Population projections by statistical area (ABS), one row per year, area,
+# age group and sex with columns Year, Area, Age Group, Sex, Population.
+# Not in the repository; the predicted figures are built when it is provided.
+POPULATION_WORKBOOK = os.path.join('data', 'population_projections.xlsx')
+POPULATION_COLUMNS = ['Year', 'Area', 'Age Group', 'Sex', 'Population']
+
+# Crude rates are published for the H2 bands, so populations are summed to them
+RATE_GRANULARITY = 'H2'
+
+# Sex labels of the H2 table; projections say Male/Female
+SEXES = ['Males', 'Females']
+SEX_LABELS = {'Male': 'Males', 'Female': 'Females', 'Males': 'Males', 'Females': 'Females'}
+
+# Exercise-based programmes cut the rate of falls among older people living in
+# the community by about a quarter (Sherrington et al., Cochrane 2019)
+FALL_PREVENTION_EFFECT = 0.23
+
+# Axis letters used in einsum subscripts
+AXES = {'scenario': 'n', 'year': 'y', 'area': 'a', 'age': 'g', 'sex': 's', 'cause': 'c'}
+
+
+# Population as a dense array plus the labels of each axis:
+#   values  shape (years, areas, ages, sexes)
+#   labels  {'year': [...], 'area': [...], 'age': [...], 'sex': [...]}
+class PopulationCube:
+    def __init__(self, values, labels):
+        self.values = values
+        self.labels = labels
+
+    # Sum a long population frame onto the H2 age bands. Rows whose age group
+    # or sex is not a band of the table (totals, 'Not stated') are dropped.
+    @classmethod
+    def from_frame(cls, population, granularity=RATE_GRANULARITY):
+        years, year_codes = _factorize(population['Year'])
+        areas, area_codes = _factorize(population['Area'])
+        age_codes = harmonize(population['Age Group'], granularity).codes
+        sex_codes = pd.Categorical(population['Sex'].map(SEX_LABELS), categories=SEXES).codes
+
+        ages = list(band_labels(granularity))
+        values = np.zeros((len(years), len(areas), len(ages), len(SEXES)))
+        keep = (age_codes >= 0) & (sex_codes >= 0)
+        np.add.at(
+            values,
+            (year_codes[keep], area_codes[keep], age_codes[keep], sex_codes[keep]),
+            population['Population'].to_numpy(dtype=float)[keep],
+        )
+        return cls(values, {'year': years, 'area': areas, 'age': ages, 'sex': list(SEXES)})
+
+
+def _factorize(column):
+    codes, uniques = pd.factorize(column, sort=True)
+    return list(uniques), codes
+
+
+def load_population(path=POPULATION_WORKBOOK, granularity=RATE_GRANULARITY):
+    return PopulationCube.from_frame(read_workbook(path)[POPULATION_COLUMNS], granularity)
+
+
+# Crude rates per person as an array of shape (ages, sexes, causes)
+def rate_array(rates=None, granularity=RATE_GRANULARITY):
+    rates = crude_rates(MACHINE_READABLE_WORKBOOK) if rates is None else rates
+    causes = list(rates.index.get_level_values('Injury Type').unique())
+    index = pd.MultiIndex.from_product(
+        [list(band_labels(granularity)), SEXES, causes], names=['Age Group', 'Sex', 'Injury Type']
+    )
+    values = rates.reindex(index).fillna(0).to_numpy() / 100_000
+    return values.reshape(len(band_labels(granularity)), len(SEXES), len(causes)), causes
+
+
+# Rate multipliers of shape (scenarios, ages, sexes, causes) for programmes
+# reaching each uptake level (0-1) of the given age bands, lowering falls by
+# effect at full uptake
+def fall_prevention_scenarios(uptake_levels, causes, effect=FALL_PREVENTION_EFFECT, ages=('65+',),
+                              granularity=RATE_GRANULARITY):
+    uptake = np.asarray(uptake_levels, dtype=float)
+    labels = list(band_labels(granularity))
+    multipliers = np.ones((len(uptake), len(labels), len(SEXES), len(causes)))
+    age_mask = np.isin(labels, ages)
+    falls = multipliers[..., causes.index('Falls')]
+    falls[:, age_mask, :] = (1 - uptake * effect)[:, None, None]
+    return multipliers
+
+
+# Expected hospitalisations: population x crude rate x scenario multiplier,
+# summed over every axis not in keep. One einsum over the whole batch, so the
+# (scenario, year, area, age, sex, cause) product is never materialised when
+# only a few axes are kept. Returns (array, labels of the kept axes in order).
+def project(population, rates=None, scenarios=None, keep=('year', 'area', 'age', 'sex', 'cause')):
+    rate_values, causes = rate_array(rates)
+    labels = dict(population.labels, cause=causes)
+    operands = [population.values, rate_values]
+    subscripts = ['yags', 'gsc']
+    if scenarios is not None:
+        operands.append(scenarios)
+        subscripts.append('ngsc')
+        labels['scenario'] = list(range(len(scenarios)))
+    elif 'scenario' in keep:
+        raise ValueError("keep includes 'scenario' but no scenarios were given")
+
+    output = ''.join(AXES[axis] for axis in keep)
+    result = np.einsum(f"{','.join(subscripts)}->{output}", *operands, optimize=True)
+    return result, {axis: labels[axis] for axis in keep}
+
+
+# Projection as a long frame with one column per kept axis, for plotting
+def project_frame(population, rates=None, scenarios=None, keep=('age', 'cause'), value='Estimated Number of People'):
+    result, labels = project(population, rates, scenarios, keep)
+    index = pd.MultiIndex.from_product(list(labels.values()), names=list(labels))
+    return pd.Series(result.ravel(), index=index, name=value).reset_index()
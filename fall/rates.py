@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from fall.age_bands import band_labels, harmonize
+from fall.compute_cache import cache_key, shared_cache
+from fall.ingest import read_workbook, sheet_fingerprint
+from fall.measures import MACHINE_READABLE_WORKBOOK, MEASURE_MODULES, load_measure_table
+from fall.projection import POPULATION_COLUMNS, POPULATION_WORKBOOK, RATE_GRANULARITY, SEX_LABELS
+
+# Rates are per this many people
+PER = 100_000
+
+# Australian standard population (estimated resident population at 30 June
+# 2001, ABS), which AIHW age-standardises its rates against
+STANDARD_POPULATION = pd.Series(
+    [1282357, 1351664, 1353177, 1352745, 1302412, 1407081, 1466615, 1492204, 1479257,
+     1358594, 1300777, 1008799, 822024, 682513, 638380, 519356, 330050, 265235],
+    index=list(band_labels('85+')), name='Population',
+)
+
+
+# Share of the standard population in each band of granularity. The
+# standard's bands must nest in the target bands.
+def standard_weights(granularity=RATE_GRANULARITY, standard=STANDARD_POPULATION):
+    codes = harmonize(pd.Series(standard.index), granularity).codes
+    if (codes < 0).any():
+        raise ValueError(f"Standard population bands do not nest in the {granularity} bands")
+    weights = np.bincount(codes, weights=standard.to_numpy(dtype=float), minlength=len(band_labels(granularity)))
+    return weights / weights.sum()
+
+
+# Population by the H2 age bands and sex implied by the H2 table: its
+# hospitalisations over its crude rates per 100,000. Summed over causes
+# first, so the rounding of small rates cancels out; rates published as 0
+# for a handful of cases are left out.
+def implied_population(path=MACHINE_READABLE_WORKBOOK):
+    key = cache_key(
+        'fall.rates.implied_population', (path,), version=sheet_fingerprint(path), modules=('fall.rates', *MEASURE_MODULES)
+    )
+    return shared_cache().get_or_compute(key, lambda: _implied_population(path))
+
+
+def _implied_population(path):
+    table = load_measure_table('H2', path).dropna()
+    table = table[table['Crude Rate'] > 0]
+    sums = table.groupby(level=['Age Group', 'Sex'], observed=True).sum()
+    population = sums['Hospitalisations'] / sums['Crude Rate'] * PER
+    return population.rename('Population').reset_index()
+
+
+# Projected population by year, age group and sex (summed over areas), from
+# the ABS projections workbook
+def projected_population(path=POPULATION_WORKBOOK):
+    key = cache_key(
+        'fall.rates.projected_population', (path,), version=sheet_fingerprint(path), modules=('fall.rates', 'fall.projection')
+    )
+    return shared_cache().get_or_compute(key, lambda: _projected_population(path))
+
+
+def _projected_population(path):
+    population = read_workbook(path)[POPULATION_COLUMNS]
+    population = population.assign(Sex=population['Sex'].map(SEX_LABELS))
+    return population.groupby(['Year', 'Age Group', 'Sex'], observed=True, as_index=False)['Population'].sum()
+
+
+# Band of each row, kept apart from 'Age Group' so strata may include ages
+_BAND = '_band'
+
+
+# Rows of frame on the bands of granularity (rows outside them dropped),
+# restricted to filters ({column: allowed values}) on the columns it has.
+# Age Group filters name bands of granularity.
+def _prepare(frame, granularity, filters):
+    ages = harmonize(frame['Age Group'], granularity)
+    frame = frame.assign(**{'Age Group': ages, _BAND: ages})
+    keep = ages.codes >= 0
+    for column, values in (filters or {}).items():
+        if column in frame.columns:
+            keep &= frame[column].isin(values).to_numpy()
+    return frame[keep]
+
+
+# value summed to one row per combination of dims and one column per age band
+def _by_age(frame, dims, value, granularity):
+    sums = frame.groupby([*dims, _BAND], observed=True)[value].sum()
+    table = sums.unstack(_BAND) if dims else sums.to_frame().T
+    return table.reindex(columns=list(band_labels(granularity))).fillna(0)
+
+
+def _index(keys):
+    return pd.MultiIndex.from_frame(keys) if keys.shape[1] > 1 else pd.Index(keys.iloc[:, 0])
+
+
+# Crude and direct age-standardised rates per PER people for every stratum
+# of by (any columns of counts), after applying filters to both tables.
+#
+# counts has an 'Age Group' column in any vocabulary, the strata columns and
+# value. population has 'Age Group', 'Population' and any of the strata
+# columns it varies by (e.g. Sex or Year). It is summed over the rest, so a
+# population by sex serves counts by sex and cause. Ages are summed onto
+# the bands of granularity. Each stratum is standardised with the standard
+# population's weights over the bands that have population in the
+# selection, so age filters give truncated rates.
+#
+# Every stratum is computed at once from (strata x age band) arrays, so a
+# rate view for any slice costs one groupby. Returns one row per stratum
+# with the by columns, value, 'Population', 'Crude Rate' and
+# 'Age-standardised Rate'. A stratum with cases in a band without population
+# gets NaN rates.
+def rates(counts, population, by=(), filters=None, value='Number of Cases', granularity=RATE_GRANULARITY,
+          standard=STANDARD_POPULATION, per=PER):
+    by = list(by)
+    missing = [dim for dim in by if dim not in counts.columns]
+    if missing:
+        raise KeyError(f"counts have no column {', '.join(missing)}")
+
+    counts = _prepare(counts, granularity, filters)
+    population = _prepare(population, granularity, filters)
+    shared = [dim for dim in by if dim in population.columns]
+
+    case_table = _by_age(counts, by, value, granularity)
+    population_table = _by_age(population, shared, 'Population', granularity)
+    strata = case_table.index.to_frame(index=False) if by else pd.DataFrame(index=[0])
+    if shared:
+        population_table = population_table.reindex(_index(strata[shared])).fillna(0)
+        population_values = population_table.to_numpy(dtype=float)
+    else:
+        population_values = np.repeat(population_table.to_numpy(dtype=float), len(case_table), axis=0)
+    cases = case_table.to_numpy(dtype=float)
+
+    has_population = population_values > 0
+    weights = np.where(has_population, standard_weights(granularity, standard), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        age_rates = np.where(has_population, cases / population_values, np.where(cases > 0, np.nan, 0.0))
+        standardised = (age_rates * weights).sum(axis=1) / weights.sum(axis=1) * per
+        crude = cases.sum(axis=1) / population_values.sum(axis=1) * per
+
+    result = strata[by].copy() if by else pd.DataFrame(index=[0])
+    result[value] = cases.sum(axis=1)
+    result['Population'] = population_values.sum(axis=1)
+    result['Crude Rate'] = crude
+    result['Age-standardised Rate'] = standardised
+    return result
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import sys
+import threading
+import zipfile
+from datetime import datetime
+from functools import lru_cache
+
+from fall.ingest import SOURCE_DIRS, read_workbook, source_workbooks
+from fall.table_store import TableStore
+
+# Sheet index of every workbook, reused while the file's mtime and size match
+INDEX_PATH = os.path.join('.cache', 'registry', 'index.json')
+
+# AIHW_INJCAT213_<dataset>[_<release as DDMMYYYY>].xlsx
+_FILE_NAME = re.compile(r'^(?:AIHW_INJCAT\d+_)?(?P<dataset>.+?)(?:_(?P<release>\d{8}))?$')
+
+# "Table H1", "B2 Transport rate", "E16-18 Falls", "Table 1a"
+_TABLE_REFERENCE = re.compile(r'^(?:Table\s+)?(?P<reference>[A-Z]{0,2}\d+[a-z]?(?:-\d+)?)\b')
+
+# Only the start of a worksheet is read, up to its <dimension> element
+_DIMENSION = re.compile(rb'<dimension ref="([^"]+)"')
+_HEADER_BYTES = 4096
+
+
+def _release_date(text):
+    return datetime.strptime(text, '%d%m%Y').date().isoformat() if text else None
+
+
+# Sheet names, table references and used ranges from the workbook XML, without
+# reading any cell data
+def index_workbook(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = _FILE_NAME.match(stem)
+    with zipfile.ZipFile(path) as archive:
+        workbook = archive.read('xl/workbook.xml').decode('utf-8')
+        rels = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        targets = dict(re.findall(r'<Relationship [^>]*Id="([^"]+)"[^>]*Target="([^"]+)"', rels))
+        targets.update({rid: target for target, rid in re.findall(r'<Relationship [^>]*Target="([^"]+)"[^>]*Id="([^"]+)"', rels)})
+
+        sheets = []
+        for name, rid in re.findall(r'<sheet [^>]*name="([^"]+)"[^>]*r:id="([^"]+)"', workbook):
+            target = targets[rid].lstrip('/')
+            member = target if target.startswith('xl/') else f'xl/{target}'
+            with archive.open(member) as sheet:
+                dimension = _DIMENSION.search(sheet.read(_HEADER_BYTES))
+            reference = _TABLE_REFERENCE.match(name)
+            sheets.append({
+                'name': _unescape(name),
+                'table': reference.group('reference') if reference else None,
+                'dimension': dimension.group(1).decode() if dimension else None,
+            })
+
+    return {
+        'path': path,
+        'folder': os.path.basename(os.path.dirname(os.path.abspath(path))),
+        'dataset': match.group('dataset'),
+        'release': _release_date(match.group('release')),
+        'sheets': sheets,
+    }
+
+
+def _unescape(text):
+    return text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&apos;', "'")
+
+
+def _read_index():
+    try:
+        with open(INDEX_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_index(index):
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    tmp_path = INDEX_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, indent=2)
+    os.replace(tmp_path, INDEX_PATH)
+
+
+# Every AIHW workbook under the source folders, grouped by dataset and release.
+# Building it costs one stat per workbook (plus the XML headers of new or
+# changed files); sheets are parsed only when first asked for and then shared
+# by every caller of the registry.
+class DatasetRegistry:
+    def __init__(self, source_dirs=SOURCE_DIRS):
+        cached = _read_index()
+        index = {}
+        for path in source_workbooks(source_dirs):
+            stat = os.stat(path)
+            entry = cached.get(path)
+            if not entry or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'workbook': index_workbook(path)}
+            index[path] = entry
+        if index != cached:
+            _write_index(index)
+
+        # Newest release first, undated files last
+        self.workbooks = sorted(
+            (entry['workbook'] for entry in index.values()),
+            key=lambda workbook: (workbook['dataset'], workbook['folder']),
+        )
+        self.workbooks.sort(key=lambda workbook: workbook['release'] or '', reverse=True)
+        self._lock = threading.Lock()
+
+    def datasets(self):
+        return sorted({workbook['dataset'] for workbook in self.workbooks})
+
+    # Workbooks of a dataset, newest release first
+    def releases(self, dataset):
+        return [workbook for workbook in self.workbooks if workbook['dataset'] == dataset]
+
+    # The workbook of dataset at release (an ISO date), or the newest one
+    def find(self, dataset, release=None):
+        for workbook in self.releases(dataset):
+            if release is None or workbook['release'] == release:
+                return workbook
+        raise KeyError(f'No workbook for {dataset!r}' + (f' released {release}' if release else ''))
+
+    # (workbook, sheet) pairs publishing a table reference such as 'H1'
+    def tables(self, reference):
+        return [
+            (workbook, sheet)
+            for workbook in self.workbooks for sheet in workbook['sheets']
+            if sheet['table'] == reference
+        ]
+
+    # Cells of one sheet, loaded on first access
+    def sheet(self, path, sheet_name):
+        with self._lock:
+            return _load_sheet(path, sheet_name)
+
+    def table_store(self, path):
+        with self._lock:
+            return _load_table_store(path)
+
+
+@lru_cache(maxsize=None)
+def _load_sheet(path, sheet_name):
+    return read_workbook(path, sheet_name=sheet_name)
+
+
+@lru_cache(maxsize=None)
+def _load_table_store(path):
+    return TableStore.from_workbook(path)
+
+
+# Label for pickers: "Machine_readable (21 Jun 2024, data/)"
+def describe(workbook):
+    release = datetime.fromisoformat(workbook['release']).strftime('%d %b %Y') if workbook['release'] else 'undated'
+    return f"{workbook['dataset']} ({release}, {workbook['folder']}/)"
+
+
+#   python -m fall.registry      list the indexed workbooks and their tables
+if __name__ == '__main__':
+    registry = DatasetRegistry(sys.argv[1:] or SOURCE_DIRS)
+    for workbook in registry.workbooks:
+        tables = [sheet['table'] for sheet in workbook['sheets'] if sheet['table']]
+        print(f"{describe(workbook)}: {len(workbook['sheets'])} sheets, tables {', '.join(tables) or '-'}")
@@ -0,0 +1,58 @@
+import numpy as np
+
+from fall import expenditure
+from fall.projection import SEXES
+
+CATEGORIES = ['Hospital', 'Home']
+
+
+# Per-age, per-sex unit costs taken once from the unit-cost table, as arrays
+# of shape (ages, sexes) with sexes in the order of the projections:
+#   cases             fall hospitalisations
+#   days              average days in hospital
+#   hospital_per_day  hospital services per person per day in hospital
+#   home_per_person   services at home per person
+class UnitCosts:
+    def __init__(self, costs):
+        costs = costs[costs['category'].isin(CATEGORIES)]
+        self.ages = [str(age) for age in costs['Age Group'].cat.remove_unused_categories().cat.categories]
+        self.sexes = [sex for sex in SEXES if sex in set(costs['Gender'])]
+
+        def grid(values, category=None, aggfunc='sum'):
+            rows = costs if category is None else costs[costs['category'] == category]
+            table = rows.pivot_table(index='Age Group', columns='Gender', values=values, aggfunc=aggfunc, observed=True)
+            return table.reindex(index=self.ages, columns=self.sexes).fillna(0).to_numpy()
+
+        self.cases = grid('Number of Cases', aggfunc='first')
+        self.days = grid('day_in_hospital', aggfunc='first')
+        self.hospital_per_day = grid('Expenditure per Person for a day', 'Hospital')
+        self.home_per_person = grid('Expenditure per Person', 'Home')
+
+    @classmethod
+    def load(cls):
+        costs = expenditure.unit_costs(
+            expenditure.clean_expenditure(expenditure.load_expenditure_summary()),
+            expenditure.fall_cases(),
+            expenditure.load_days_in_hospital(),
+        )
+        return cls(costs)
+
+
+# Expected cases per (age, sex) after growth and prevention
+def scenario_cases(unit_costs, case_growth=0.0, fall_reduction=0.0, min_age_index=0):
+    prevented = np.zeros(len(unit_costs.ages))
+    prevented[min_age_index:] = fall_reduction
+    return unit_costs.cases * (1 + case_growth) * (1 - prevented)[:, None]
+
+
+# Hospital and home cost by age group under a what-if scenario:
+#   case_growth     relative change in fall cases, e.g. 0.1 for 10% more
+#   stay_change     relative change in the average length of stay
+#   fall_reduction  share of falls prevented (camera-assisted monitoring)
+#   min_age_index   first age group the prevention reaches
+# With every argument at zero the totals equal the recorded expenditure.
+def simulate(unit_costs, case_growth=0.0, stay_change=0.0, fall_reduction=0.0, min_age_index=0):
+    cases = scenario_cases(unit_costs, case_growth, fall_reduction, min_age_index)
+    hospital = cases * unit_costs.hospital_per_day * unit_costs.days * (1 + stay_change)
+    home = cases * unit_costs.home_per_person
+    return {'Hospital': hospital.sum(axis=1), 'Home': home.sum(axis=1), 'Cases': cases.sum(axis=1)}
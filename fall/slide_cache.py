@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fall.figures import read_slide, slide_source
+
+# Default memory budget for cached slide HTML
+MAX_BYTES = 64 * 1024 * 1024
+
+
+# Modification time of the file behind a slide
+def file_stamp(path):
+    return os.stat(slide_source(path)).st_mtime_ns
+
+
+# Rendered slide HTML shared by every session of a Streamlit process.
+# Entries are evicted least recently used first once max_bytes is exceeded,
+# and reloaded when the stamp of a slide (by default, the modification time
+# of its file) changes.
+class SlideCache:
+    def __init__(self, max_bytes=MAX_BYTES, loader=read_slide, stamp=file_stamp):
+        self.max_bytes = max_bytes
+        self._loader = loader
+        self._stamp = stamp
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slide-prefetch')
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        stamp = self._stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        content = self._loader(path)
+        self._store(path, stamp, content)
+        return content
+
+    # Load slides in the background so the next click is served from memory
+    def prefetch(self, paths):
+        for path in paths:
+            self._prefetcher.submit(self._warm, path)
+
+    def _warm(self, path):
+        try:
+            self.get(path)
+        except OSError:
+            pass
+
+    def _store(self, path, stamp, content):
+        size = len(content)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if size > self.max_bytes:
+                return
+            self._entries[path] = (stamp, content, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
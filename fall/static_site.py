@@ -0,0 +1,206 @@
+import gzip
+import html
+import json
+import os
+import shutil
+import sys
+
+from fall.deck import load_deck
+from fall.figures import PLOTLY_VERSION, STATIC_DIRS, bundle_name, figure_path, slide_source
+
+# Optional: annotations fall back to escaped text and files to gzip only
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Exported decks are written here, one folder per manifest
+SITE_DIR = 'site'
+
+# Files compressed next to the originals for gzip_static / brotli_static serving
+COMPRESSED_EXTENSIONS = ('.html', '.json', '.js', '.css')
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{page_title}</title>
+    <link rel="stylesheet" href="{root}style.css">
+</head>
+<body>
+{body}
+<script>
+    window.PLOTLY_BUNDLE = "{root}assets/{bundle}";
+</script>
+<script src="{root}assets/lazy-figures.js" defer></script>
+</body>
+</html>
+"""
+
+SLIDE_TEMPLATE = """<h1>{deck_title}</h1>
+<h4>Slide {number} of {count}: {title}</h4>
+<div class="progress-bar"><div class="progress-bar-fill" style="width: {progress}%;"></div></div>
+<nav class="slide-nav">{previous} <a href="{root}index.html">All slides</a> {next}</nav>
+{annotation}
+{figures}
+"""
+
+# Fetches each figure's JSON only when it scrolls into view, and loads the
+# shared plotly bundle once, on the first figure
+LAZY_FIGURES_JS = """(function () {
+    var plotly = null;
+    function loadPlotly() {
+        if (!plotly) {
+            plotly = new Promise(function (resolve, reject) {
+                var script = document.createElement("script");
+                script.src = window.PLOTLY_BUNDLE;
+                script.onload = function () { resolve(window.Plotly); };
+                script.onerror = reject;
+                document.head.appendChild(script);
+            });
+        }
+        return plotly;
+    }
+    function draw(element) {
+        Promise.all([loadPlotly(), fetch(element.dataset.src).then(function (r) { return r.json(); })])
+            .then(function (results) {
+                var figure = results[1];
+                results[0].newPlot(element, figure.data, figure.layout, figure.config || {responsive: true});
+            });
+    }
+    var figures = document.querySelectorAll(".figure[data-src]");
+    if (!("IntersectionObserver" in window)) {
+        figures.forEach(draw);
+        return;
+    }
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                draw(entry.target);
+            }
+        });
+    }, {rootMargin: "200px"});
+    figures.forEach(function (element) { observer.observe(element); });
+})();
+"""
+
+
+def _markdown_html(text):
+    if markdown is not None:
+        return markdown.markdown(text)
+    return f'<pre class="annotation">{html.escape(text)}</pre>'
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+
+# Copy a figure into the site. Returns the element that lazy-loads it and the
+# plotly.js version it needs (None for plain HTML slides).
+def _figure_element(html_filename, height, width, out_dir):
+    source = slide_source(html_filename)
+    name = os.path.basename(source)
+    shutil.copyfile(source, os.path.join(out_dir, 'figures', name))
+    size = f'height: {height}px;' + (f' width: {width}px;' if width else '')
+    if source == figure_path(html_filename):
+        with open(source, 'r', encoding='utf-8') as file:
+            version = json.load(file).get('plotly_version', PLOTLY_VERSION)
+        return f'<div class="figure" data-src="../figures/{name}" style="{size}"></div>', version
+    # Plain HTML slides keep their own page, loaded lazily by the browser
+    return f'<iframe class="figure-frame" src="../figures/{name}" loading="lazy" style="{size} border: none;"></iframe>', None
+
+
+def _slide_link(index, label):
+    return f'<a href="{index + 1:02d}.html">{label}</a>'
+
+
+# Write .gz (and .br when brotli is installed) copies of every text asset
+def precompress(out_dir):
+    for folder, _, names in os.walk(out_dir):
+        for name in names:
+            if not name.endswith(COMPRESSED_EXTENSIONS):
+                continue
+            path = os.path.join(folder, name)
+            with open(path, 'rb') as file:
+                data = file.read()
+            with open(path + '.gz', 'wb') as file:
+                file.write(gzip.compress(data, compresslevel=9))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as file:
+                    file.write(brotli.compress(data))
+
+
+# Render a deck manifest as a static site with one page per slide. Serve the
+# folder with any static file server; for nginx enable gzip_static (and
+# brotli_static) so the precompressed copies are sent as-is.
+def export_deck(deck_path, out_dir=None):
+    deck = load_deck(deck_path)
+    out_dir = out_dir or os.path.join(SITE_DIR, os.path.splitext(os.path.basename(deck_path))[0])
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    for folder in ('assets', 'figures', 'slides'):
+        os.makedirs(os.path.join(out_dir, folder))
+
+    _write(os.path.join(out_dir, 'assets', 'lazy-figures.js'), LAZY_FIGURES_JS)
+    _write(os.path.join(out_dir, 'style.css'), deck.text(deck.stylesheet) if deck.stylesheet else '')
+
+    count = len(deck.slides)
+    for index, slide in enumerate(deck.slides):
+        elements = [_figure_element(figure, slide['height'], slide['width'], out_dir) for figure in slide['figures']]
+        figures = '\n'.join(element for element, _ in elements)
+
+        # All figures of a slide come from one export, so one bundle serves the page
+        version = next((version for _, version in elements if version), PLOTLY_VERSION)
+        bundle = bundle_name(version)
+        if not os.path.exists(os.path.join(out_dir, 'assets', bundle)):
+            shutil.copyfile(os.path.join(STATIC_DIRS[0], bundle), os.path.join(out_dir, 'assets', bundle))
+        body = SLIDE_TEMPLATE.format(
+            deck_title=html.escape(deck.title),
+            number=index + 1,
+            count=count,
+            title=html.escape(slide['title']),
+            progress=(index + 1) / count * 100,
+            previous=_slide_link(index - 1, '⬅️ Previous') if index > 0 else '',
+            next=_slide_link(index + 1, 'Next ➡️') if index < count - 1 else '',
+            root='../',
+            annotation=_markdown_html(deck.text(slide['markdown'])) if slide['markdown'] else '',
+            figures=figures,
+        )
+        page = PAGE_TEMPLATE.format(
+            page_title=html.escape(f"{slide['title']} - {deck.title}"), root='../', bundle=bundle, body=body
+        )
+        _write(os.path.join(out_dir, 'slides', f'{index + 1:02d}.html'), page)
+
+    # Index page: the markdown tabs followed by the list of slides
+    sections = [f'<h1>{html.escape(deck.title)}</h1>']
+    for tab in deck.tabs:
+        if tab.get('slides'):
+            links = ''.join(
+                f'<li><a href="slides/{index + 1:02d}.html">{html.escape(slide["title"])}</a></li>'
+                for index, slide in enumerate(deck.slides)
+            )
+            sections.append(f'<h2>{html.escape(tab["name"])}</h2>\n<ol>{links}</ol>')
+        elif tab.get('markdown'):
+            sections.append(_markdown_html(deck.text(tab['markdown'])))
+    index_page = PAGE_TEMPLATE.format(
+        page_title=html.escape(deck.title), root='', bundle=bundle_name(), body='\n'.join(sections)
+    )
+    _write(os.path.join(out_dir, 'index.html'), index_page)
+
+    precompress(out_dir)
+    return out_dir
+
+
+#   python -m fall.static_site decks/population.json decks/expenditure.json
+if __name__ == '__main__':
+    for deck_path in sys.argv[1:]:
+        print(f'Exported {deck_path} to {export_deck(deck_path)}')
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from fall.age_bands import band_labels, harmonize
+from fall.expenditure import HOME_SERVICES, HOSPITAL_SERVICES, NOT_REPORTED
+from fall.ingest import read_workbook
+from fall.measures import MACHINE_READABLE_WORKBOOK
+
+# Multiples of the real data size the benchmarks run at
+SCALES = (10, 100, 1000)
+
+# Spread of the synthetic values around the real ones (log-scale)
+VALUE_SIGMA = 0.2
+
+# Years of the real expenditure summary; scaled summaries repeat them for
+# more broad areas
+EXPENDITURE_YEARS = tuple(range(2015, 2023))
+
+
+def _jitter(rng, values, sigma=VALUE_SIGMA):
+    return np.round(values * rng.lognormal(-sigma ** 2 / 2, sigma, size=len(values)))
+
+
+# Machine-readable tables scale times the size of template, with the same
+# TableReference / ReportingCategory1-4 / MeasureValueNumber schema and
+# dtypes as read_workbook returns. Every table is repeated once per synthetic
+# reporting period (PeriodFrom/PeriodTo counting back a year per copy) with
+# values jittered around the real ones, so detail and total rows, categories
+# and labels all look like an AIHW release.
+def machine_readable(scale, seed=0, template=None):
+    template = read_workbook(MACHINE_READABLE_WORKBOOK) if template is None else template
+    rng = np.random.default_rng(seed)
+    rows = len(template)
+
+    columns = {}
+    for column in template.columns:
+        values = template[column]
+        if column in ('PeriodFrom', 'PeriodTo', 'MeasureValueNumber', 'MeasureValueLabel'):
+            continue
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[column] = pd.Categorical.from_codes(np.tile(values.cat.codes.to_numpy(), scale), dtype=values.dtype)
+        else:
+            columns[column] = np.tile(values.to_numpy(), scale)
+    df = pd.DataFrame(columns)
+
+    # One reporting period per copy, e.g. "2021-2022" for the second copy
+    first_year = int(str(template['PeriodFrom'].iloc[0])[:4])
+    periods = [f'{first_year - copy}-{first_year - copy + 1}' for copy in range(scale)]
+    df['PeriodFrom'] = df['PeriodTo'] = pd.Categorical.from_codes(np.repeat(np.arange(scale), rows), categories=periods)
+
+    # Labels are the values as whole numbers; suppressed cells ("n.p.") keep theirs
+    values = _jitter(rng, np.tile(template['MeasureValueNumber'].to_numpy(dtype=float), scale))
+    labels = pa.array(values, from_pandas=True).cast(pa.int64()).cast(pa.string())
+    original = pc.take(pa.array(template['MeasureValueLabel'], type=pa.string()), np.tile(np.arange(rows), scale))
+    df['MeasureValueNumber'] = values
+    df['MeasureValueLabel'] = pd.Series(pc.if_else(pc.is_null(labels), original, labels), dtype='string')
+    return df[list(template.columns)]
+
+
+# Fall rows of an expenditure summary, shaped like load_expenditure_summary()
+# returns them: every age group, area and sex (including 'Not reported') for
+# each of EXPENDITURE_YEARS, in scale broad areas ('Injury', 'Injury 2', ...),
+# so every row keeps a valid year and cleans into a stratum of its own.
+def expenditure_summary(scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    broad_areas = ['Injury', *[f'Injury {copy}' for copy in range(2, scale + 1)]]
+    years = [f'{year}-{str(year + 1)[-2:]}' for year in EXPENDITURE_YEARS]
+    ages = [*band_labels('85+'), NOT_REPORTED]
+    areas = HOSPITAL_SERVICES + HOME_SERVICES
+    sexes = ['Males', 'Females', NOT_REPORTED]
+
+    index = pd.MultiIndex.from_product(
+        [broad_areas, ages, areas, sexes, years], names=['Broad area', 'Age groups', 'Areas of expenditure', 'Sex', 'Year']
+    )
+    df = index.to_frame(index=False)
+    base = rng.lognormal(13, 1, size=len(df))
+    base[(df['Age groups'] == NOT_REPORTED) | (df['Sex'] == NOT_REPORTED)] *= 0.05
+    df['Total expenditure $ (constant prices)'] = np.round(base).astype(np.int64)
+    return df
+
+
+# Average days in hospital by broad age group, shaped like the workbook sheet
+def days_in_hospital():
+    days = pd.DataFrame({
+        'Mapped Age Group': list(band_labels('broad')),
+        'Males': [2.0, 4.0, 8.0],
+        'Females': [2.5, 4.5, 9.0],
+    })
+    days = days.melt(id_vars=['Mapped Age Group'], var_name='Gender', value_name='day_in_hospital')
+    days['Mapped Age Group'] = harmonize(days['Mapped Age Group'], 'broad')
+    return days
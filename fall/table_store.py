@@ -0,0 +1,59 @@
+import numpy as np
+
+from fall.ingest import read_workbook
+
+# Labels AIHW uses for the total rows of each reporting category
+TOTAL_LABELS = {
+    'ReportingCategory1': 'Persons',
+    'ReportingCategory2': 'All external causes',
+    'ReportingCategory4': 'All ages',
+}
+
+
+# Per-TableReference frames split once from the machine-readable workbook.
+# Within each table the detail rows come first and the total rows last, so
+# excluding totals is a positional slice (a view) rather than a boolean scan.
+class TableStore:
+    def __init__(self, df):
+        self._tables = {}
+        self._detail_rows = {}
+
+        positions = df.groupby('TableReference', observed=True, sort=False).indices
+        for table_ref, rows in positions.items():
+            table = df.iloc[rows]
+
+            is_total = np.zeros(len(table), dtype=bool)
+            for column, label in TOTAL_LABELS.items():
+                if column in table.columns:
+                    is_total |= (table[column] == label).to_numpy(dtype=bool, na_value=False)
+
+            order = np.argsort(is_total, kind='stable')
+            table = table.iloc[order].reset_index(drop=True)
+            for column in table.select_dtypes('category').columns:
+                table[column] = table[column].cat.remove_unused_categories()
+
+            self._tables[str(table_ref)] = table
+            self._detail_rows[str(table_ref)] = int((~is_total).sum())
+
+    @classmethod
+    def from_workbook(cls, file_path):
+        return cls(read_workbook(file_path))
+
+    def table_references(self):
+        return list(self._tables)
+
+    # Rows of one table; with exclude_totals the "Persons", "All external
+    # causes" and "All ages" rows are left out
+    def get_table(self, table_ref, exclude_totals=False):
+        table = self._tables[table_ref]
+        if exclude_totals:
+            return table.iloc[:self._detail_rows[table_ref]]
+        return table
+
+    # Only the precomputed total rows of one table
+    def get_totals(self, table_ref):
+        return self._tables[table_ref].iloc[self._detail_rows[table_ref]:]
+
+    def __contains__(self, table_ref):
+        return table_ref in self._tables
+
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fall.age_bands import harmonize
+
+# Default spread of the sampled multipliers (log-scale standard deviations)
+CASE_SIGMA = 0.05
+STAY_SIGMA = 0.10
+COST_SIGMA = 0.10
+
+PERCENTILES = (2.5, 50, 97.5)
+
+# Upper bound on the arrays alive per chunk of draws
+MEMORY_BUDGET = 256 * 1024 ** 2
+
+# float64 arrays of one chunk's full shape held at once while sampling
+_ARRAYS_PER_DRAW = 4
+
+
+# Lognormal multipliers with mean 1
+def _multipliers(rng, shape, sigma):
+    return rng.lognormal(-sigma ** 2 / 2, sigma, size=shape)
+
+
+# Draws of one chunk, run in-process or in a worker. Shapes:
+#   expected_cases            (ages, sexes, areas)
+#   hospital/home_per_case    (ages, sexes)
+# Each draw samples a rate multiplier and a length-of-stay multiplier per age
+# group, a price multiplier, and Poisson case counts per cell. Returns hospital
+# and home cost per draw and age group, summed over sex and area.
+def _sample_chunk(args):
+    size, seed, expected_cases, hospital_per_case, home_per_case, sigmas = args
+    case_sigma, stay_sigma, cost_sigma = sigmas
+    rng = np.random.default_rng(seed)
+    ages = expected_cases.shape[0]
+
+    rate = _multipliers(rng, (size, ages, 1, 1), case_sigma)
+    cases = rng.poisson(expected_cases[None] * rate).astype(float)
+    cases_by_age_sex = cases.sum(axis=3)
+    del cases, rate
+
+    stay = _multipliers(rng, (size, ages, 1), stay_sigma)
+    price = _multipliers(rng, (size, 1, 1), cost_sigma)
+    hospital = (cases_by_age_sex * hospital_per_case[None] * stay * price).sum(axis=2)
+    home = (cases_by_age_sex * home_per_case[None] * price).sum(axis=2)
+    return hospital, home
+
+
+# Sample total fall costs n_draws times in chunks that fit memory_budget,
+# across worker processes when workers > 1. Seeds are spawned per chunk, so
+# the result depends on seed and chunk layout only, not on workers.
+#
+# Areas only matter for the count noise, and a sum of Poisson counts is
+# Poisson, so pass expected_cases summed over areas (a size-1 area axis)
+# unless per-area draws are needed; it is exact and much cheaper.
+def sample_costs(expected_cases, hospital_per_case, home_per_case, n_draws=10_000, seed=0, workers=None,
+                 case_sigma=CASE_SIGMA, stay_sigma=STAY_SIGMA, cost_sigma=COST_SIGMA, memory_budget=MEMORY_BUDGET):
+    expected_cases = np.asarray(expected_cases, dtype=float)
+    if expected_cases.ndim == 2:
+        expected_cases = expected_cases[..., None]
+    bytes_per_draw = expected_cases.size * 8 * _ARRAYS_PER_DRAW
+    chunk_size = max(1, min(n_draws, memory_budget // bytes_per_draw))
+
+    sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    seeds = root.spawn(len(sizes))
+    sigmas = (case_sigma, stay_sigma, cost_sigma)
+    tasks = [(size, child, expected_cases, hospital_per_case, home_per_case, sigmas) for size, child in zip(sizes, seeds)]
+
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_sample_chunk, tasks))
+    else:
+        results = [_sample_chunk(task) for task in tasks]
+    return {
+        'Hospital': np.concatenate([hospital for hospital, _ in results]),
+        'Home': np.concatenate([home for _, home in results]),
+    }
+
+
+# Percentiles over draws (axis 0) as a frame with one column per percentile
+def percentile_frame(samples, index, percentiles=PERCENTILES):
+    values = np.percentile(samples, percentiles, axis=0)
+    return pd.DataFrame(values.T, index=index, columns=[f'p{p:g}' for p in percentiles])
+
+
+# Hospital and home cost per case of unit_costs, summed onto a coarser
+# granularity weighted by cases. Returns arrays of shape (bands, sexes).
+# Every age group must fall in one of the coarser bands.
+def per_case_costs(unit_costs, granularity):
+    hospital = unit_costs.hospital_per_day * unit_costs.days * unit_costs.cases
+    home = unit_costs.home_per_person * unit_costs.cases
+    codes = harmonize(pd.Series(unit_costs.ages), granularity)
+    if (codes.codes < 0).any():
+        unmapped = [str(age) for age, code in zip(unit_costs.ages, codes.codes) if code < 0]
+        raise ValueError(f"Age groups {', '.join(unmapped)} do not fall in the {granularity} bands")
+    bands = len(codes.categories)
+
+    def regroup(values):
+        grouped = np.zeros((bands, values.shape[1]))
+        np.add.at(grouped, codes.codes, values)
+        return grouped
+
+    cases = regroup(unit_costs.cases)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(regroup(hospital) / cases), np.nan_to_num(regroup(home) / cases)
+
+
+# Bands of this year's cost by age group, from the recorded cases
+def cost_bands(unit_costs, n_draws=10_000, seed=0, workers=None, percentiles=PERCENTILES, **sigmas):
+    samples = sample_costs(
+        unit_costs.cases, unit_costs.hospital_per_day * unit_costs.days, unit_costs.home_per_person,
+        n_draws=n_draws, seed=seed, workers=workers, **sigmas
+    )
+    total = samples['Hospital'] + samples['Home']
+    return percentile_frame(total, pd.Index(unit_costs.ages, name='Age Group'), percentiles)
+
+
+# Bands of total projected fall cost per year. expected_falls has shape
+# (years, areas, ages, sexes) on the same age bands as the per-case costs.
+def projected_cost_bands(expected_falls, years, hospital_per_case, home_per_case, n_draws=10_000, seed=0,
+                         workers=None, keep_areas=False, percentiles=PERCENTILES, **sigmas):
+    totals = np.empty((n_draws, len(years)))
+    children = np.random.SeedSequence(seed).spawn(len(years))
+    for position, child in enumerate(children):
+        expected = expected_falls[position].transpose(1, 2, 0)
+        if not keep_areas:
+            expected = expected.sum(axis=2, keepdims=True)
+        samples = sample_costs(
+            expected, hospital_per_case, home_per_case, n_draws=n_draws, seed=child, workers=workers, **sigmas
+        )
+        totals[:, position] = (samples['Hospital'] + samples['Home']).sum(axis=1)
+    return percentile_frame(totals, pd.Index(years, name='Year'), percentiles)